@@ -0,0 +1,94 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import HttpResponseRedirect, JsonResponse
+from django.utils.cache import get_conditional_response
+
+from foodgram.constants import Constants
+from recipes.ingredient_index import ingredient_index
+from recipes.short_links import resolved_links
+
+from .conditional import make_etag, set_cache_headers
+from .views import (IngredientViewSet, RecipeViewSet, TagViewSet,
+                    short_link_redirect)
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+def run_in_pool(view):
+    """Runs a sync view on the shared thread pool.
+
+    Django 3.2 has no async ORM, and the default sync_to_async wrapper
+    funnels every sync view through one thread. Reads are independent of
+    each other, so they run in parallel here; the response is rendered
+    and the thread's connections released before returning to the loop.
+    """
+    def call(request, *args, **kwargs):
+        record = getattr(request, '_metrics', None)
+        if record is not None:
+            record.instrument()
+        try:
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            return response
+        finally:
+            if record is not None:
+                record.release()
+            close_old_connections()
+
+    return sync_to_async(call, thread_sensitive=False)
+
+
+def read_in_pool(view):
+    """Reads go to the thread pool, writes keep the sync request thread."""
+    read_view = run_in_pool(view)
+    write_view = sync_to_async(view)
+
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        if request.method in READ_METHODS:
+            return await read_view(request, *args, **kwargs)
+        return await write_view(request, *args, **kwargs)
+
+    return async_view
+
+
+tag_list = read_in_pool(TagViewSet.as_view({'get': 'list'}))
+recipe_detail = read_in_pool(RecipeViewSet.as_view({
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+}))
+sync_ingredient_list = read_in_pool(
+    IngredientViewSet.as_view({'get': 'list'})
+)
+resolve_short_link = run_in_pool(short_link_redirect)
+
+
+async def ingredient_list(request):
+    # Индекс может устареть в любой момент: ответ строится по одному
+    # снимку, иначе загрузка попала бы в цикл событий.
+    snapshot = ingredient_index.current()
+    if request.method not in READ_METHODS or snapshot is None:
+        return await sync_ingredient_list(request)
+    etag = make_etag('ingredients', *snapshot[2])
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(
+            ingredient_index.search(request.GET.get('name', ''), snapshot),
+            safe=False,
+            json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')}
+        )
+    return set_cache_headers(
+        response, etag, public=True, max_age=Constants.CATALOG_CACHE_MAX_AGE
+    )
+
+
+async def short_link(request, code):
+    pk = resolved_links.get(code)
+    if pk is None:
+        return await resolve_short_link(request, code)
+    return HttpResponseRedirect(f'/recipes/{pk}')
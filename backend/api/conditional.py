@@ -0,0 +1,27 @@
+import hashlib
+
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import quote_etag
+
+
+def make_etag(*parts):
+    return quote_etag(
+        hashlib.md5('|'.join(map(str, parts)).encode()).hexdigest()
+    )
+
+
+def set_cache_headers(response, etag, **cache_control):
+    response['ETag'] = etag
+    patch_cache_control(response, **cache_control)
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+def conditional_get(request, etag, respond, **cache_control):
+    response = get_conditional_response(
+        getattr(request, '_request', request), etag=etag
+    )
+    if response is None:
+        response = respond()
+    return set_cache_headers(response, etag, **cache_control)
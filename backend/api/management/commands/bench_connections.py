@@ -0,0 +1,54 @@
+import statistics
+import time
+from io import BytesIO
+from wsgiref.util import setup_testing_defaults
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает задержку GET /api/tags/ с новым соединением на каждый '
+        'запрос и с постоянным соединением.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--host', default='localhost')
+        parser.add_argument('--path', default='/api/tags/')
+
+    def request(self, handler, options):
+        environ = {
+            'PATH_INFO': options['path'],
+            'HTTP_HOST': options['host'],
+            'wsgi.input': BytesIO(),
+        }
+        setup_testing_defaults(environ)
+        started = time.perf_counter()
+        response = handler(environ, lambda status, headers: None)
+        b''.join(response)
+        response.close()
+        return (time.perf_counter() - started) * 1000
+
+    def handle(self, *args, **options):
+        handler = WSGIHandler()
+        initial_max_age = connection.settings_dict['CONN_MAX_AGE']
+        try:
+            modes = (('новое соединение', 0), ('постоянное', 600))
+            for label, max_age in modes:
+                connection.close()
+                connection.settings_dict['CONN_MAX_AGE'] = max_age
+                timings = [
+                    self.request(handler, options)
+                    for _ in range(options['requests'])
+                ]
+                timings.sort()
+                self.stdout.write(
+                    f'{label}: p50 {statistics.median(timings):.2f} мс, '
+                    f'p99 {timings[int(len(timings) * 0.99) - 1]:.2f} мс'
+                )
+        finally:
+            connection.close()
+            connection.settings_dict['CONN_MAX_AGE'] = initial_max_age
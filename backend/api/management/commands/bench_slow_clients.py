@@ -0,0 +1,132 @@
+import asyncio
+import json
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from .run_benchmarks import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность серверов под нагрузкой '
+        'медленных клиентов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', action='append', required=True,
+            help='Адрес сервера, например http://localhost:8000 '
+                 '(можно указать несколько).'
+        )
+        parser.add_argument(
+            '--path', action='append',
+            help='Путь для быстрых клиентов (можно указать несколько).'
+        )
+        parser.add_argument('--duration', type=float, default=10.0)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--slow-clients', type=int, default=50)
+        parser.add_argument(
+            '--slow-interval', type=float, default=1.0,
+            help='Пауза между строками заголовков медленного клиента, сек.'
+        )
+        parser.add_argument('--output', help='Файл для JSON с результатами.')
+
+    def handle(self, *args, **options):
+        paths = options['path'] or [
+            '/api/tags/', '/api/ingredients/?name=а', '/api/recipes/1/'
+        ]
+        results = {}
+        for url in options['url']:
+            parts = urlsplit(url)
+            if parts.scheme != 'http' or not parts.hostname:
+                raise CommandError(f'Поддерживается только http: {url}')
+            results[url] = asyncio.run(self.run(
+                parts.hostname, parts.port or 80, paths, options
+            ))
+
+        self.stdout.write(
+            f'{"server":<32} {"rps":>8} {"ok":>7} {"errors":>7} '
+            f'{"p50 ms":>8} {"p95 ms":>8}'
+        )
+        for url, result in results.items():
+            self.stdout.write(
+                f'{url:<32} {result["rps"]:>8.1f} {result["ok"]:>7} '
+                f'{result["errors"]:>7} {result["p50_ms"]:>8.1f} '
+                f'{result["p95_ms"]:>8.1f}'
+            )
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+
+    async def run(self, host, port, paths, options):
+        deadline = time.perf_counter() + options['duration']
+        timings, errors = [], 0
+
+        async def slow_client():
+            # Держит соединение, отправляя заголовки по одной строке.
+            try:
+                reader, writer = await asyncio.open_connection(host, port)
+            except OSError:
+                return
+            try:
+                writer.write(
+                    f'GET {paths[0]} HTTP/1.1\r\nHost: {host}\r\n'.encode()
+                )
+                while time.perf_counter() < deadline:
+                    writer.write(b'X-Slow-Client: 1\r\n')
+                    await writer.drain()
+                    await asyncio.sleep(options['slow_interval'])
+            except OSError:
+                pass
+            finally:
+                writer.close()
+
+        async def fast_client(number):
+            nonlocal errors
+            position = number
+            while time.perf_counter() < deadline:
+                path = paths[position % len(paths)]
+                position += 1
+                started = time.perf_counter()
+                try:
+                    status = await asyncio.wait_for(
+                        self.fetch(host, port, path),
+                        deadline - started + 1
+                    )
+                except (OSError, IndexError, ValueError, asyncio.TimeoutError):
+                    status = None
+                if status is not None and status < 500:
+                    timings.append((time.perf_counter() - started) * 1000)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(slow_client() for _ in range(options['slow_clients'])),
+            *(fast_client(number) for number in range(options['concurrency']))
+        )
+        elapsed = time.perf_counter() - started
+        return {
+            'rps': len(timings) / elapsed,
+            'ok': len(timings),
+            'errors': errors,
+            'p50_ms': statistics.median(timings) if timings else 0.0,
+            'p95_ms': percentile(timings, 0.95) if timings else 0.0,
+        }
+
+    async def fetch(self, host, port, path):
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            writer.write(
+                f'GET {path} HTTP/1.1\r\nHost: {host}\r\n'
+                f'Connection: close\r\n\r\n'.encode()
+            )
+            await writer.drain()
+            status_line = await reader.readline()
+            await reader.read()
+        finally:
+            writer.close()
+        return int(status_line.split()[1])
@@ -0,0 +1,206 @@
+import random
+from io import BytesIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from PIL import Image
+
+from foodgram.constants import Constants
+from recipes.models import (Favorite, FeedEntry, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag)
+from user.models import Subscription, User
+
+BATCH_SIZE = 2000
+TAGS = (('Завтрак', 'breakfast'), ('Обед', 'lunch'), ('Ужин', 'dinner'))
+
+
+def created_ids(model, since, count):
+    return list(model.objects.filter(pk__gt=since).order_by(
+        'pk'
+    ).values_list('pk', flat=True)[:count])
+
+
+def last_id(model):
+    return model.objects.order_by('-pk').values_list(
+        'pk', flat=True
+    ).first() or 0
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу синтетическими данными для нагрузочных замеров.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--subscriptions-per-user', type=int, default=10)
+        parser.add_argument('--favorites-per-user', type=int, default=20)
+        parser.add_argument('--cart-per-user', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        if not Ingredient.objects.exists():
+            call_command('load_ingredients', stdout=self.stdout)
+        ingredient_ids = list(Ingredient.objects.values_list('pk', flat=True))
+
+        with transaction.atomic():
+            tag_ids = []
+            for name, slug in TAGS:
+                tag, _ = Tag.objects.get_or_create(
+                    slug=slug, defaults={'name': name}
+                )
+                tag_ids.append(tag.pk)
+            user_ids = self.create_users(options['users'])
+            recipe_ids = self.create_recipes(
+                rng, user_ids, options['recipes']
+            )
+            self.create_relations(
+                rng, recipe_ids, ingredient_ids, tag_ids, options
+            )
+            self.create_activity(rng, user_ids, recipe_ids, options)
+        call_command('recount_counters', stdout=self.stdout)
+        # bulk_create не отправляет сигналы: ленты, поисковые векторы,
+        # похожие рецепты и популярность заполняются отдельно.
+        self.create_feed(recipe_ids)
+        call_command('update_search_vectors', missing=True, stdout=self.stdout)
+        call_command(
+            'build_similar_recipes', incremental=True, stdout=self.stdout
+        )
+        call_command('update_popularity', stdout=self.stdout)
+        self.stdout.write(
+            f'Создано пользователей: {len(user_ids)}, '
+            f'рецептов: {len(recipe_ids)}.'
+        )
+
+    def create_users(self, count):
+        since = last_id(User)
+        password = make_password('benchmark-password')
+        User.objects.bulk_create(
+            [
+                User(
+                    username=f'bench_{since}_{number}',
+                    email=f'bench_{since}_{number}@example.com',
+                    first_name='Bench',
+                    last_name=str(number),
+                    password=password,
+                )
+                for number in range(count)
+            ],
+            batch_size=BATCH_SIZE
+        )
+        return created_ids(User, since, count)
+
+    def create_recipes(self, rng, user_ids, count):
+        buffer = BytesIO()
+        Image.new('RGB', (640, 480), 'orange').save(buffer, 'JPEG')
+        image_name = Recipe._meta.get_field('image').storage.save(
+            'media/benchmark.jpg', ContentFile(buffer.getvalue())
+        )
+
+        since = last_id(Recipe)
+        Recipe.objects.bulk_create(
+            [
+                Recipe(
+                    author_id=rng.choice(user_ids),
+                    name=f'Рецепт {since + number}',
+                    text='Синтетический рецепт для замеров.',
+                    cooking_time=rng.randint(5, 180),
+                    image=image_name,
+                )
+                for number in range(count)
+            ],
+            batch_size=BATCH_SIZE
+        )
+        return created_ids(Recipe, since, count)
+
+    def create_relations(self, rng, recipe_ids, ingredient_ids, tag_ids,
+                         options):
+        per_recipe = min(
+            options['ingredients_per_recipe'], len(ingredient_ids)
+        )
+        RecipeIngredient.objects.bulk_create(
+            (
+                RecipeIngredient(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=rng.randint(1, 500)
+                )
+                for recipe_id in recipe_ids
+                for ingredient_id in rng.sample(
+                    ingredient_ids, rng.randint(1, per_recipe)
+                )
+            ),
+            batch_size=BATCH_SIZE
+        )
+        RecipeTag = Recipe.tags.through
+        RecipeTag.objects.bulk_create(
+            (
+                RecipeTag(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in recipe_ids
+                for tag_id in rng.sample(tag_ids, rng.randint(1, 2))
+            ),
+            batch_size=BATCH_SIZE
+        )
+
+    def create_activity(self, rng, user_ids, recipe_ids, options):
+        def pick(population, count):
+            return rng.sample(population, min(count, len(population)))
+
+        Subscription.objects.bulk_create(
+            (
+                Subscription(user_id=user_id, author_id=author_id)
+                for user_id in user_ids
+                for author_id in pick(
+                    user_ids, options['subscriptions_per_user']
+                )
+                if author_id != user_id
+            ),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True
+        )
+        Favorite.objects.bulk_create(
+            (
+                Favorite(user_id=user_id, recipe_id=recipe_id)
+                for user_id in user_ids
+                for recipe_id in pick(
+                    recipe_ids, options['favorites_per_user']
+                )
+            ),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True
+        )
+        ShoppingCart.objects.bulk_create(
+            (
+                ShoppingCart(user_id=user_id, recipe_id=recipe_id)
+                for user_id in user_ids
+                for recipe_id in pick(recipe_ids, options['cart_per_user'])
+            ),
+            batch_size=BATCH_SIZE
+        )
+
+    def create_feed(self, recipe_ids):
+        recipes_by_author = {}
+        for author_id, recipe_id in Recipe.objects.filter(
+            pk__in=recipe_ids
+        ).values_list('author_id', 'pk').iterator():
+            recipes_by_author.setdefault(author_id, []).append(recipe_id)
+
+        subscriptions = Subscription.objects.filter(
+            author_id__in=recipes_by_author,
+            author__followers_count__lte=Constants.FEED_FAN_OUT_LIMIT
+        ).values_list('user_id', 'author_id').iterator()
+        FeedEntry.objects.bulk_create(
+            (
+                FeedEntry(
+                    user_id=user_id, recipe_id=recipe_id, author_id=author_id
+                )
+                for user_id, author_id in subscriptions
+                for recipe_id in recipes_by_author[author_id]
+            ),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True
+        )
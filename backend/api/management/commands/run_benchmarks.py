@@ -0,0 +1,139 @@
+import json
+import statistics
+import time
+from datetime import datetime, timezone
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe, ShoppingCart
+from user.models import Subscription, User
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class Command(BaseCommand):
+    help = 'Замеряет задержки и число запросов основных эндпоинтов API.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--host', default='localhost')
+        parser.add_argument('--output', help='Файл для JSON с результатами.')
+        parser.add_argument(
+            '--compare', help='JSON предыдущего прогона для сравнения.'
+        )
+
+    def scenarios(self):
+        user = User.objects.filter(
+            follower__isnull=False, shopping_cart__isnull=False
+        ).first()
+        recipe = Recipe.objects.order_by('pk').first()
+        ingredient = Ingredient.objects.order_by('pk').first()
+        if user is None or recipe is None or ingredient is None:
+            raise CommandError(
+                'Нет данных для замеров, запустите generate_fixtures.'
+            )
+        token, _ = Token.objects.get_or_create(user=user)
+        auth = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+        prefix = ingredient.name[:3]
+        return {
+            'recipes_list_anonymous': ('/api/recipes/?limit=10', {}),
+            'recipes_list': ('/api/recipes/?limit=10', auth),
+            'recipes_list_deep_page': ('/api/recipes/?limit=10&page=50', auth),
+            'recipes_list_cursor': ('/api/recipes/?limit=10&cursor=', auth),
+            'recipes_filter_tags': (
+                '/api/recipes/?limit=10&tags=breakfast&tags=dinner', auth
+            ),
+            'recipes_filter_favorited': (
+                '/api/recipes/?limit=10&is_favorited=1', auth
+            ),
+            'recipe_detail': (f'/api/recipes/{recipe.pk}/', auth),
+            'subscriptions': (
+                '/api/users/subscriptions/?limit=6&recipes_limit=3', auth
+            ),
+            'feed': ('/api/recipes/feed/?limit=10', auth),
+            'download_shopping_cart': (
+                '/api/recipes/download_shopping_cart/', auth
+            ),
+            'ingredient_search': (f'/api/ingredients/?name={prefix}', {}),
+            'tags': ('/api/tags/', {}),
+        }
+
+    def measure(self, client, url, headers, iterations, warmup):
+        for _ in range(warmup):
+            self.consume(client.get(url, **headers))
+        timings, queries, statuses = [], [], set()
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(url, **headers)
+                self.consume(response)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured.captured_queries))
+            statuses.add(response.status_code)
+        return {
+            'url': url,
+            'status': sorted(statuses),
+            'p50_ms': round(statistics.median(timings), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2),
+            'mean_ms': round(statistics.mean(timings), 2),
+            'queries_min': min(queries),
+            'queries_max': max(queries),
+        }
+
+    @staticmethod
+    def consume(response):
+        if response.streaming:
+            b''.join(response.streaming_content)
+
+    def handle(self, *args, **options):
+        client = Client(SERVER_NAME=options['host'])
+        results = {
+            name: self.measure(
+                client, url, headers,
+                options['iterations'], options['warmup']
+            )
+            for name, (url, headers) in self.scenarios().items()
+        }
+        report = {
+            'meta': {
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'database': connection.vendor,
+                'django': django.get_version(),
+                'iterations': options['iterations'],
+                'users': User.objects.count(),
+                'recipes': Recipe.objects.count(),
+                'subscriptions': Subscription.objects.count(),
+                'cart_items': ShoppingCart.objects.count(),
+            },
+            'scenarios': results,
+        }
+
+        baseline = {}
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                baseline = json.load(file)['scenarios']
+
+        for name, result in results.items():
+            line = (
+                f'{name:28} p50 {result["p50_ms"]:8.2f} мс  '
+                f'p99 {result["p99_ms"]:8.2f} мс  '
+                f'запросов {result["queries_max"]:4}'
+            )
+            if name in baseline:
+                before = baseline[name]['p50_ms']
+                change = (result['p50_ms'] - before) / before * 100
+                line += f'  p50 {change:+.1f}%'
+            self.stdout.write(line)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
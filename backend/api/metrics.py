@@ -0,0 +1,95 @@
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from .response_cache import cache_stats
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+HISTOGRAMS = {
+    'foodgram_request_duration_seconds': (
+        'Полное время обработки запроса.', LATENCY_BUCKETS
+    ),
+    'foodgram_request_db_duration_seconds': (
+        'Время, проведённое в запросах к базе.', LATENCY_BUCKETS
+    ),
+    'foodgram_request_app_duration_seconds': (
+        'Время представления без учёта базы: сериализация и логика.',
+        LATENCY_BUCKETS
+    ),
+    'foodgram_request_render_duration_seconds': (
+        'Время рендеринга ответа.', LATENCY_BUCKETS
+    ),
+    'foodgram_request_db_queries': (
+        'Количество запросов к базе за запрос.', QUERY_BUCKETS
+    ),
+}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = defaultdict(dict)
+
+    def observe(self, name, labels, value):
+        labels = tuple(sorted(labels.items()))
+        with self._lock:
+            histogram = self._histograms[name].get(labels)
+            if histogram is None:
+                histogram = Histogram(HISTOGRAMS[name][1])
+                self._histograms[name][labels] = histogram
+            histogram.observe(value)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, (description, _) in HISTOGRAMS.items():
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+                for labels, histogram in self._histograms[name].items():
+                    lines.extend(render_histogram(name, labels, histogram))
+        stats = cache_stats()
+        for kind in ('hits', 'misses'):
+            name = f'foodgram_recipe_response_cache_{kind}_total'
+            lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name} {stats[kind]}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    return ','.join(
+        '{}="{}"'.format(
+            key, str(value).replace('\\', '\\\\').replace('"', '\\"')
+        )
+        for key, value in labels
+    )
+
+
+def render_histogram(name, labels, histogram):
+    cumulative = 0
+    bounds = [*map(str, histogram.buckets), '+Inf']
+    for bound, count in zip(bounds, histogram.counts):
+        cumulative += count
+        bucket_labels = format_labels((*labels, ('le', bound)))
+        yield f'{name}_bucket{{{bucket_labels}}} {cumulative}'
+    yield f'{name}_sum{{{format_labels(labels)}}} {histogram.sum}'
+    yield f'{name}_count{{{format_labels(labels)}}} {histogram.count}'
+
+
+registry = Registry()
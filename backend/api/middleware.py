@@ -0,0 +1,160 @@
+import asyncio
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import registry
+
+logger = logging.getLogger('foodgram.slow_requests')
+
+
+class RequestRecord:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.view_started = None
+        self.view_finished = None
+        self.view_db_time = 0.0
+        self.render_time = 0.0
+        self._instrumented = []
+
+    def instrument(self):
+        """Counts queries of the calling thread's connections."""
+        for connection in connections.all():
+            if self.execute not in connection.execute_wrappers:
+                connection.execute_wrappers.append(self.execute)
+                self._instrumented.append(connection)
+
+    def release(self):
+        while self._instrumented:
+            self._instrumented.pop().execute_wrappers.remove(self.execute)
+
+    def start_view(self):
+        self.view_started = time.perf_counter()
+        self.view_db_time = -self.db_time
+
+    def finish_view(self):
+        if self.view_started is None or self.view_finished is not None:
+            return
+        self.view_finished = time.perf_counter()
+        self.view_db_time += self.db_time
+
+    @property
+    def app_time(self):
+        if self.view_started is None:
+            return 0.0
+        return max(
+            self.view_finished - self.view_started - self.view_db_time, 0.0
+        )
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        record = request._metrics = RequestRecord()
+        record.instrument()
+        try:
+            response = self.get_response(request)
+        finally:
+            record.release()
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        record = request._metrics = RequestRecord()
+        try:
+            response = await self.get_response(request)
+        finally:
+            record.release()
+        return self.finish(request, response)
+
+    def finish(self, request, response):
+        record = request._metrics
+        record.finish_view()
+        total = time.perf_counter() - record.started
+        app_time = record.app_time
+
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={record.db_time * 1000:.1f};'
+            f'desc="{record.queries} queries"',
+            f'app;dur={app_time * 1000:.1f}',
+            f'render;dur={record.render_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+
+        match = getattr(request, 'resolver_match', None)
+        labels = {
+            'view': match.view_name if match else 'unmatched',
+            'method': request.method,
+        }
+        registry.observe(
+            'foodgram_request_duration_seconds', labels, total
+        )
+        registry.observe(
+            'foodgram_request_db_duration_seconds', labels, record.db_time
+        )
+        registry.observe(
+            'foodgram_request_app_duration_seconds', labels, app_time
+        )
+        registry.observe(
+            'foodgram_request_render_duration_seconds',
+            labels,
+            record.render_time
+        )
+        registry.observe(
+            'foodgram_request_db_queries', labels, record.queries
+        )
+
+        if (
+            total * 1000 >= settings.SLOW_REQUEST_MS
+            or record.queries >= settings.SLOW_REQUEST_QUERIES
+        ):
+            logger.warning(json.dumps({
+                'event': 'slow_request',
+                'method': request.method,
+                'path': request.get_full_path(),
+                'view': labels['view'],
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 1),
+                'db_ms': round(record.db_time * 1000, 1),
+                'app_ms': round(app_time * 1000, 1),
+                'render_ms': round(record.render_time * 1000, 1),
+                'queries': record.queries,
+            }, ensure_ascii=False))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Under ASGI this runs on the thread that executes sync views.
+        request._metrics.instrument()
+        request._metrics.start_view()
+
+    def process_template_response(self, request, response):
+        record = request._metrics
+        record.finish_view()
+
+        def finish_render(rendered):
+            record.render_time = time.perf_counter() - render_started
+
+        render_started = time.perf_counter()
+        response.add_post_render_callback(finish_render)
+        return response
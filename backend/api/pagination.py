@@ -0,0 +1,135 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    count_query_param = 'count'
+    page_size = api_settings.PAGE_SIZE
+    ordering = ('id',)
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        position, self.reverse = self.decode_cursor(request)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) == '1':
+            self.count = queryset.count()
+
+        order = [
+            f'-{field}' if self.is_descending(index) else field
+            for index, field in enumerate(self.fields)
+        ]
+        queryset = queryset.order_by(*order)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if self.reverse:
+            results.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return page_size if page_size > 0 else self.page_size
+
+    @property
+    def fields(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def is_descending(self, index):
+        return self.ordering[index].startswith('-') != self.reverse
+
+    def after(self, position):
+        condition = Q()
+        for index, field in enumerate(self.fields):
+            lookup = 'lt' if self.is_descending(index) else 'gt'
+            equal = dict(zip(self.fields[:index], position[:index]))
+            condition |= Q(**equal, **{f'{field}__{lookup}': position[index]})
+        if len(self.fields) == 1:
+            return condition
+        # По OR индекс не получает начала диапазона: лишнее условие
+        # на первое поле позволяет начать чтение с позиции курсора.
+        lookup = 'lte' if self.is_descending(0) else 'gte'
+        return Q(**{f'{self.fields[0]}__{lookup}': position[0]}) & condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            reverse, *position = json.loads(
+                base64.urlsafe_b64decode(encoded.encode('ascii'))
+            )
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, bool(reverse)
+
+    def encode_cursor(self, instance, reverse):
+        position = [getattr(instance, field) for field in self.fields]
+        encoded = base64.urlsafe_b64encode(
+            json.dumps([int(reverse), *position]).encode()
+        ).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.get_next_link()
+        response['previous'] = self.get_previous_link()
+        response['results'] = data
+        return Response(response)
+
+
+class RecipeKeysetPagination(KeysetPagination):
+    ordering = ('name', 'id')
+
+
+class SubscriptionKeysetPagination(KeysetPagination):
+    ordering = ('username', 'id')
+
+
+class FeedPagination(KeysetPagination):
+    ordering = ('-id',)
@@ -0,0 +1,67 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from foodgram.constants import Constants
+from recipes.cache import catalog_generation
+
+CACHED_PARAMS = (
+    'author', 'count', 'cursor', 'limit', 'ordering', 'page', 'search',
+    'tags'
+)
+HITS_KEY = 'recipes:cache:hits'
+MISSES_KEY = 'recipes:cache:misses'
+
+
+def response_cache_key(request):
+    params = sorted(
+        (name, value)
+        for name in CACHED_PARAMS
+        for value in request.query_params.getlist(name)
+    )
+    digest = hashlib.md5(urlencode(params).encode()).hexdigest()
+    return (
+        f'recipes:response:{catalog_generation()}:'
+        f'{request.accepted_renderer.format}:{request.path}:{digest}'
+    )
+
+
+def count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def cached_response(request, respond):
+    if request.user.is_authenticated:
+        return respond()
+
+    key = response_cache_key(request)
+    cached = cache.get(key)
+    if cached is not None:
+        count(HITS_KEY)
+        data, status = cached
+        response = Response(data, status=status)
+        response['X-Cache'] = 'HIT'
+        return response
+
+    count(MISSES_KEY)
+    response = respond()
+    if response.status_code == 200:
+        cache.set(
+            key,
+            (response.data, response.status_code),
+            timeout=Constants.RECIPE_RESPONSE_CACHE_TIMEOUT
+        )
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+def cache_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    return {'hits': hits, 'misses': misses}
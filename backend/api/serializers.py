@@ -1,21 +1,79 @@
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
 
 from foodgram.constants import Constants
+from recipes.images import variant_url
+from recipes.memberships import memberships_for
 from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.signals import ingredients_changed
 from user.models import User, Subscription
 
 
+class VariantImageField(serializers.ImageField):
+    def __init__(self, variant, **kwargs):
+        self.variant = variant
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        url = variant_url(value, self.variant)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tag
-        fields = '__all__'
+        fields = ('id', 'name', 'slug')
+
+
+def resolve_in_bulk(queryset, ids, message):
+    """Fetches all referenced objects with one query."""
+    found = queryset.in_bulk(set(ids))
+    missing = sorted(set(ids) - found.keys())
+    if missing:
+        raise serializers.ValidationError(
+            message.format(ids=', '.join(map(str, missing)))
+        )
+    return found
+
+
+class PrimaryKeyListField(serializers.ListField):
+    child = serializers.IntegerField()
+
+    def __init__(self, queryset, message, **kwargs):
+        self.queryset = queryset
+        self.message = message
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        ids = super().to_internal_value(data)
+        found = resolve_in_bulk(self.queryset, ids, self.message)
+        return [found[pk] for pk in ids]
+
+    def to_representation(self, value):
+        return [obj.pk for obj in value.all()]
+
+
+class IngredientAmountListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+        ingredients = resolve_in_bulk(
+            Ingredient.objects.all(),
+            [item['ingredient_id'] for item in items],
+            'Ингредиенты не найдены: {ids}.'
+        )
+        for item in items:
+            item['ingredient'] = ingredients[item.pop('ingredient_id')]
+        return items
 
 
 class IngredientAmountSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(),
-        source='ingredient'
-    )
+    id = serializers.IntegerField(source='ingredient_id')
     name = serializers.CharField(
         source='ingredient.name',
         read_only=True
@@ -32,12 +90,13 @@ class IngredientAmountSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecipeIngredient
         fields = ('id', 'name', 'measurement_unit', 'amount')
+        list_serializer_class = IngredientAmountListSerializer
 
 
 class IngredientSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ingredient
-        fields = '__all__'
+        fields = ('id', 'name', 'measurement_unit')
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -96,6 +155,7 @@ class UserListSerializer(serializers.ModelSerializer):
 
 class UserRetrieveSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
+    avatar = VariantImageField('avatar', read_only=True)
 
     class Meta:
         model = User
@@ -110,13 +170,32 @@ class UserRetrieveSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        request_user = self.context['request'].user
-        if request_user.is_authenticated:
-            return request_user.follower.filter(author=obj).exists()
-        return False
+        return memberships_for(self.context['request']).follows(obj.pk)
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    add = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=Constants.BULK_RECIPES_MAX,
+        default=list
+    )
+    remove = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=Constants.BULK_RECIPES_MAX,
+        default=list
+    )
+
+    def validate(self, attrs):
+        if set(attrs['add']) & set(attrs['remove']):
+            raise serializers.ValidationError(
+                'Рецепт нельзя одновременно добавить и удалить.'
+            )
+        return attrs
 
 
 class RecipeShortSerializer(serializers.ModelSerializer):
+    image = VariantImageField('thumbnail', read_only=True)
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
@@ -124,7 +203,7 @@ class RecipeShortSerializer(serializers.ModelSerializer):
 
 class SubscriptionSerializer(serializers.ModelSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(read_only=True)
     avatar = serializers.SerializerMethodField()
     is_subscribed = serializers.SerializerMethodField()
 
@@ -143,16 +222,17 @@ class SubscriptionSerializer(serializers.ModelSerializer):
             recipes = recipes[:int(limit)]
         return RecipeShortSerializer(recipes, many=True).data
 
-    def get_recipes_count(self, obj):
-        return obj.recipe.count()
-
     def get_avatar(self, obj):
         request = self.context.get('request')
         if obj.avatar:
-            return request.build_absolute_uri(obj.avatar.url)
+            return request.build_absolute_uri(
+                variant_url(obj.avatar, 'avatar')
+            )
         return None
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context['request'].user
         return obj.following.filter(user=user).exists()
 
@@ -195,9 +275,9 @@ class RecipeSerializer(serializers.ModelSerializer):
         many=True,
         source='recipeingredient_set'
     )
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Tag.objects.all()
+    tags = PrimaryKeyListField(
+        queryset=Tag.objects.all(),
+        message='Теги не найдены: {ids}.'
     )
     image = serializers.ImageField(required=False)
     author = UserRetrieveSerializer(read_only=True)
@@ -224,16 +304,10 @@ class RecipeSerializer(serializers.ModelSerializer):
         )
 
     def get_is_favorited(self, obj):
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return user.favorites.filter(id=obj.id).exists()
-        return False
+        return memberships_for(self.context['request']).has_favorite(obj.pk)
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return user.shopping_cart.filter(recipe=obj).exists()
-        return False
+        return memberships_for(self.context['request']).has_in_cart(obj.pk)
 
     def validate(self, attrs):
         ingredients = self.context['request'].data.get('ingredients', [])
@@ -257,29 +331,66 @@ class RecipeSerializer(serializers.ModelSerializer):
 
         return attrs
 
-    def handle_ingredients(self, recipe, ingredients_data):
-        recipe.recipeingredient_set.all().delete()
-
-        recipe_ingredients = []
-        for ingredient_data in ingredients_data:
-            ingredient = ingredient_data.get('ingredient')
-            amount = ingredient_data.get('amount')
-
-            if not isinstance(ingredient, Ingredient):
-                ingredient = Ingredient.objects.get(id=ingredient)
-
-            recipe_ingredients.append(
-                RecipeIngredient(
-                    recipe=recipe,
-                    ingredient=ingredient,
-                    amount=amount)
+    def handle_ingredients(self, recipe, ingredients_data, existing=()):
+        amounts = {
+            data['ingredient'].pk: data['amount']
+            for data in ingredients_data
+        }
+
+        rows, removed, removed_ingredients = {}, [], set()
+        for row in existing:
+            if row.ingredient_id in amounts and row.ingredient_id not in rows:
+                rows[row.ingredient_id] = row
+            else:
+                removed.append(row.pk)
+                removed_ingredients.add(row.ingredient_id)
+        existing = rows
+        removed_ingredients.difference_update(amounts)
+        added = [
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient_id=ingredient_id,
+                amount=amount
             )
-
-        RecipeIngredient.objects.bulk_create(recipe_ingredients)
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in existing
+        ]
+        changed = []
+        for ingredient_id, row in existing.items():
+            amount = amounts.get(ingredient_id, row.amount)
+            if amount != row.amount:
+                row.amount = amount
+                changed.append(row)
+
+        if removed:
+            RecipeIngredient.objects.filter(pk__in=removed).delete()
+        if added:
+            RecipeIngredient.objects.bulk_create(added)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+
+        ingredients_changed.send(
+            sender=Recipe,
+            recipe_id=recipe.pk,
+            added=[row.ingredient_id for row in added],
+            removed=removed_ingredients
+        )
 
     def handle_tags(self, recipe, tags_data):
         recipe.tags.set(tags_data)
 
+    def refresh_related(self, recipe):
+        recipe._prefetched_objects_cache = {}
+        prefetch_related_objects(
+            [recipe],
+            Prefetch(
+                'recipeingredient_set',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+            'tags'
+        )
+
+    @transaction.atomic
     def update(self, instance, validated_data):
         instance.name = validated_data.get('name', instance.name)
         instance.text = validated_data.get('text', instance.text)
@@ -288,8 +399,6 @@ class RecipeSerializer(serializers.ModelSerializer):
             instance.cooking_time
         )
 
-        validated_data = self.validate(validated_data)
-
         image_data = validated_data.get('image', None)
         if image_data:
             instance.image = image_data
@@ -299,11 +408,15 @@ class RecipeSerializer(serializers.ModelSerializer):
         ingredients_data = validated_data.get('recipeingredient_set', [])
         tags_data = validated_data.get('tags', [])
 
-        self.handle_ingredients(instance, ingredients_data)
+        self.handle_ingredients(
+            instance, ingredients_data, instance.recipeingredient_set.all()
+        )
         self.handle_tags(instance, tags_data)
+        self.refresh_related(instance)
 
         return instance
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('recipeingredient_set', [])
         tags_data = validated_data.pop('tags', [])
@@ -312,12 +425,16 @@ class RecipeSerializer(serializers.ModelSerializer):
 
         self.handle_ingredients(recipe, ingredients_data)
         self.handle_tags(recipe, tags_data)
+        self.refresh_related(recipe)
 
         return recipe
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        representation[
-            'image'] = instance.image.url if instance.image else None
-        representation['tags'] = TagSerializer(instance.tags, many=True).data
+        representation['image'] = (
+            variant_url(instance.image, 'detail') if instance.image else None
+        )
+        representation['tags'] = TagSerializer(
+            instance.tags.all(), many=True
+        ).data
         return representation
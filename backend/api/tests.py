@@ -0,0 +1,436 @@
+import json
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.handlers.asgi import ASGIHandler
+from django.core.cache import cache
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections, connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from foodgram.constants import Constants
+from recipes.ingredient_index import ingredient_index
+from recipes.models import (Favorite, FeedEntry, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag)
+from recipes.signals import ingredients_changed
+from user.models import Subscription, User
+
+
+class FoodgramAPITestCase(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='cook@example.com',
+            username='cook',
+            first_name='Иван',
+            last_name='Петров',
+            password='Secret-pass-42'
+        )
+        cls.user.recipes_count = 12
+        cls.user.save(update_fields=['recipes_count'])
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(3)
+        ]
+        # bulk_create не ставит в очередь подготовку вариантов картинки.
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=cls.user,
+                name=f'Рецепт {number}',
+                image='media/recipe.png',
+                text='Описание',
+                cooking_time=10
+            )
+            for number in range(12)
+        )
+        cls.recipes = list(Recipe.objects.order_by('id'))
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=cls.tag)
+            for recipe in cls.recipes
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe, ingredient=ingredient, amount=number + 1
+            )
+            for number, recipe in enumerate(cls.recipes)
+            for ingredient in cls.ingredients
+        )
+
+    def setUp(self):
+        cache.clear()
+
+
+class ASGIRoutesTest(FoodgramAPITestCase):
+
+    def request_asgi(self, path, headers=()):
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': b'',
+            'root_path': '',
+            'headers': [(b'host', b'testserver'), *headers],
+            'client': ('127.0.0.1', 50000),
+            'server': ('testserver', 80),
+        }
+        # Как и тестовый клиент, не даём обработчику закрыть соединение
+        # внутри транзакции теста.
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        try:
+            async_to_sync(ASGIHandler())(scope, receive, send)
+        finally:
+            request_started.connect(close_old_connections)
+            request_finished.connect(close_old_connections)
+        status = messages[0]['status']
+        body = b''.join(
+            message.get('body', b'') for message in messages[1:]
+        )
+        return status, body
+
+    @override_settings(ROOT_URLCONF='foodgram.asgi_urls')
+    def test_download_shopping_cart(self):
+        for recipe in self.recipes[:2]:
+            ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        token = Token.objects.create(user=self.user)
+
+        status, body = self.request_asgi(
+            '/api/recipes/download_shopping_cart/',
+            [(b'authorization', f'Token {token.key}'.encode())]
+        )
+
+        self.assertEqual(status, 200)
+        text = body.decode()
+        self.assertIn('Список покупок', text)
+        for ingredient in self.ingredients:
+            self.assertIn(f'{ingredient.name} - 3 г', text)
+
+    @override_settings(ROOT_URLCONF='foodgram.asgi_urls')
+    def test_ingredient_list_survives_expiry_during_request(self):
+        ingredient_index.invalidate()
+        ingredient_index.search()
+        # Индекс устаревает сразу после первой проверки.
+        with mock.patch.object(
+            ingredient_index, 'is_fresh', side_effect=[True, False, False]
+        ):
+            status, body = self.request_asgi('/api/ingredients/')
+
+        self.assertEqual(status, 200)
+        self.assertEqual(len(json.loads(body)), len(self.ingredients))
+
+
+class RecipeListQueriesTest(FoodgramAPITestCase):
+
+    def count_queries(self, path):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        self.assertEqual(
+            self.count_queries('/api/recipes/?limit=1'),
+            self.count_queries('/api/recipes/?limit=10')
+        )
+
+    def test_actions_without_body_skip_prefetch(self):
+        self.client.force_authenticate(self.user)
+        recipe = self.recipes[0]
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/recipes/{recipe.pk}/get-link/')
+        self.assertEqual(response.status_code, 200)
+
+
+class RecipeCursorPaginationTest(FoodgramAPITestCase):
+
+    def test_pages_cover_all_recipes_in_order(self):
+        names = []
+        url = '/api/recipes/?cursor=&limit=5'
+        while url:
+            with CaptureQueriesContext(connection) as context:
+                data = self.client.get(url).json()
+            names.extend(recipe['name'] for recipe in data['results'])
+            if names[5:]:
+                page_sql = context.captured_queries[0]['sql']
+                self.assertIn('"recipes_recipe"."name" >=', page_sql)
+            url = data['next']
+        self.assertEqual(
+            names, [recipe.name for recipe in sorted(
+                self.recipes, key=lambda recipe: (recipe.name, recipe.pk)
+            )]
+        )
+
+
+class FeedTest(FoodgramAPITestCase):
+
+    def create_reader(self, name):
+        reader = User.objects.create_user(
+            email=f'{name}@example.com',
+            username=name,
+            first_name='Читатель',
+            last_name='Тестовый',
+            password='Secret-pass-42'
+        )
+        Subscription.objects.create(user=reader, author=self.user)
+        return reader
+
+    @mock.patch.object(Constants, 'FEED_FAN_OUT_LIMIT', 1)
+    def test_pulled_recipes_stay_after_dropping_to_limit(self):
+        reader = self.create_reader('reader')
+        leaving = self.create_reader('leaving')
+        self.assertFalse(FeedEntry.objects.exists())
+
+        self.client.force_authenticate(reader)
+        pulled = self.client.get('/api/recipes/feed/?limit=100').json()
+        self.assertEqual(len(pulled['results']), len(self.recipes))
+
+        self.client.force_authenticate(leaving)
+        response = self.client.delete(f'/api/users/{self.user.pk}/subscribe/')
+        self.assertEqual(response.status_code, 204)
+
+        self.client.force_authenticate(reader)
+        feed = self.client.get('/api/recipes/feed/?limit=100').json()
+        self.assertEqual(feed['results'], pulled['results'])
+
+
+@mock.patch('recipes.signals.schedule_variants')
+class RecipeIngredientsUpdateTest(FoodgramAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.recipes[0]
+        self.salt, self.sugar, self.flour = self.ingredients
+        self.pepper = Ingredient.objects.create(
+            name='Перец', measurement_unit='г'
+        )
+        self.rows = {
+            row.ingredient_id: row
+            for row in self.recipe.recipeingredient_set.order_by('-pk')
+        }
+        self.duplicate = RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=self.salt, amount=7
+        )
+        self.changes = []
+        ingredients_changed.connect(self.record_change)
+        self.addCleanup(ingredients_changed.disconnect, self.record_change)
+        self.client.force_authenticate(self.user)
+
+    def record_change(self, recipe_id, added, removed, **kwargs):
+        self.changes.append((recipe_id, sorted(added), sorted(removed)))
+
+    def test_patch_applies_diff(self, schedule_variants):
+        with self.assertNumQueries(19):
+            response = self.client.patch(
+                f'/api/recipes/{self.recipe.pk}/',
+                {
+                    'ingredients': [
+                        {'id': self.salt.pk, 'amount': 1},
+                        {'id': self.sugar.pk, 'amount': 4},
+                        {'id': self.pepper.pk, 'amount': 2},
+                    ],
+                    'tags': [self.tag.pk],
+                },
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+
+        rows = {
+            row.ingredient_id: row
+            for row in self.recipe.recipeingredient_set.all()
+        }
+        self.assertEqual(
+            set(rows), {self.salt.pk, self.sugar.pk, self.pepper.pk}
+        )
+        # Неизменённая строка и строка с новым количеством сохраняются,
+        # дубликат и убранный ингредиент удаляются.
+        self.assertEqual(rows[self.salt.pk].pk, self.rows[self.salt.pk].pk)
+        self.assertEqual(rows[self.salt.pk].amount, 1)
+        self.assertEqual(rows[self.sugar.pk].pk, self.rows[self.sugar.pk].pk)
+        self.assertEqual(rows[self.sugar.pk].amount, 4)
+        self.assertEqual(rows[self.pepper.pk].amount, 2)
+        self.assertFalse(
+            RecipeIngredient.objects.filter(pk__in=[
+                self.duplicate.pk, self.rows[self.flour.pk].pk
+            ]).exists()
+        )
+        self.assertEqual(
+            self.changes,
+            [(self.recipe.pk, [self.pepper.pk], [self.flour.pk])]
+        )
+        self.assertEqual(
+            sorted(
+                (item['id'], item['amount'])
+                for item in response.data['ingredients']
+            ),
+            sorted([
+                (self.salt.pk, 1), (self.sugar.pk, 4), (self.pepper.pk, 2)
+            ])
+        )
+
+
+class BulkUserListTest(FoodgramAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+        self.kept, self.new, self.dropped, self.missing = self.recipes[:4]
+        Favorite.objects.create(user=self.user, recipe=self.kept)
+        Favorite.objects.create(user=self.user, recipe=self.dropped)
+
+    def test_bulk_favorite(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/recipes/favorite/bulk/',
+                {
+                    'add': [self.kept.pk, self.new.pk, 10 ** 6],
+                    'remove': [self.dropped.pk, self.missing.pk],
+                },
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['results'], [
+            {'id': self.kept.pk, 'status': 'exists'},
+            {'id': self.new.pk, 'status': 'added'},
+            {'id': 10 ** 6, 'status': 'not_found'},
+            {'id': self.dropped.pk, 'status': 'removed'},
+            {'id': self.missing.pk, 'status': 'absent'},
+        ])
+
+        counts = dict(Recipe.objects.filter(
+            pk__in=[self.kept.pk, self.new.pk, self.dropped.pk]
+        ).values_list('pk', 'favorites_count'))
+        self.assertEqual(
+            counts, {self.kept.pk: 1, self.new.pk: 1, self.dropped.pk: 0}
+        )
+        self.assertEqual(
+            set(Favorite.objects.filter(user=self.user).values_list(
+                'recipe_id', flat=True
+            )),
+            {self.kept.pk, self.new.pk}
+        )
+        detail = self.client.get(f'/api/recipes/{self.new.pk}/')
+        self.assertTrue(detail.data['is_favorited'])
+
+    def test_bulk_shopping_cart(self):
+        ShoppingCart.objects.create(user=self.user, recipe=self.kept)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/recipes/shopping_cart/bulk/',
+                {'add': [self.new.pk], 'remove': [self.kept.pk]},
+                format='json'
+            )
+        self.assertEqual(response.data['results'], [
+            {'id': self.new.pk, 'status': 'added'},
+            {'id': self.kept.pk, 'status': 'removed'},
+        ])
+        counts = dict(Recipe.objects.filter(
+            pk__in=[self.kept.pk, self.new.pk]
+        ).values_list('pk', 'in_carts_count'))
+        self.assertEqual(counts, {self.kept.pk: 0, self.new.pk: 1})
+        detail = self.client.get(f'/api/recipes/{self.kept.pk}/')
+        self.assertFalse(detail.data['is_in_shopping_cart'])
+
+
+class CatalogTest(FoodgramAPITestCase):
+
+    def test_catalog_hides_service_fields(self):
+        tags = self.client.get('/api/tags/').json()
+        self.assertEqual(set(tags[0]), {'id', 'name', 'slug'})
+        ingredients = self.client.get('/api/ingredients/').json()
+        self.assertEqual(
+            set(ingredients[0]), {'id', 'name', 'measurement_unit'}
+        )
+
+
+class RecipeETagTest(FoodgramAPITestCase):
+
+    def test_etag_changes_with_related_objects(self):
+        url = f'/api/recipes/{self.recipes[0].pk}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+
+        self.user.first_name = 'Пётр'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['author']['first_name'], 'Пётр')
+
+        etag = response['ETag']
+        ingredient = self.ingredients[0]
+        ingredient.measurement_unit = 'кг'
+        with self.captureOnCommitCallbacks(execute=True):
+            ingredient.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_non_author_changes_keep_etag(self):
+        url = f'/api/recipes/{self.recipes[0].pk}/'
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/users/', {
+                'email': 'reader@example.com',
+                'username': 'reader',
+                'first_name': 'Анна',
+                'last_name': 'Иванова',
+                'password': 'Secret-pass-42',
+            })
+            self.user.set_password('Another-pass-42')
+            self.user.save()
+        self.assertTrue(User.objects.filter(username='reader').exists())
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+
+    def test_generation_changes_after_commit(self):
+        url = f'/api/recipes/{self.recipes[0].pk}/'
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes[0].tags.clear()
+            self.assertEqual(
+                self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+                304
+            )
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+
+class ShortLinkTest(FoodgramAPITestCase):
+
+    def test_redirect(self):
+        recipe = self.recipes[0]
+        link = self.client.get(
+            f'/api/recipes/{recipe.pk}/get-link/'
+        ).data['short-link']
+        response = self.client.get(link)
+        self.assertRedirects(
+            response, f'/recipes/{recipe.pk}', fetch_redirect_response=False
+        )
+
+    def test_out_of_range_codes(self):
+        for code in ('zzzzzzzzzzzzzzzzzzzzzz', 'zzzzzzzzzzz', 'aZl8N0y58M8'):
+            with self.assertNumQueries(0):
+                response = self.client.get(f'/s/{code}')
+            self.assertEqual(response.status_code, 404)
@@ -1,7 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
+from .views import (IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet,
+                    metrics)
 
 router = DefaultRouter()
 router.register(r'recipes', RecipeViewSet, basename='recipes')
@@ -10,6 +11,7 @@ router.register(r'ingredients', IngredientViewSet)
 router.register(r'users', UserViewSet, basename='users')
 
 urlpatterns = [
+    path('_metrics', metrics, name='metrics'),
     path('', include(router.urls)),
     path('users/set_password/', UserViewSet.as_view(
         {'post': 'set_password'}
@@ -0,0 +1,27 @@
+import csv
+
+SHOPPING_LIST_HEADER = ('Ингредиент', 'Количество', 'Единица измерения')
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def shopping_list_txt(rows):
+    yield 'Список покупок:\n\n'
+    for name, unit, amount in rows:
+        yield f'{name} - {amount} {unit}\n'
+
+
+def shopping_list_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(SHOPPING_LIST_HEADER)
+    for name, unit, amount in rows:
+        yield writer.writerow((name, amount, unit))
+
+
+SHOPPING_LIST_FORMATS = {
+    'txt': shopping_list_txt,
+    'csv': shopping_list_csv,
+}
@@ -1,29 +1,50 @@
-import base64
-from collections import defaultdict
-
-from django.core.files.base import ContentFile
-from django.http import HttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import (BooleanField, Count, F, Max, Prefetch, Sum,
+                              Value, prefetch_related_objects)
+from django.http import (Http404, HttpResponse, HttpResponseRedirect,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.serializers import SetPasswordSerializer
 from rest_framework import filters, status, viewsets
-from rest_framework.decorators import action
+from rest_framework.decorators import (action, api_view,
+                                       permission_classes)
+from rest_framework.exceptions import ValidationError
 from rest_framework.pagination import PageNumberPagination
-from rest_framework.permissions import (IsAuthenticated,
+from rest_framework.permissions import (IsAdminUser, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 
+from foodgram.constants import Constants
 from user.models import Subscription, User
+from recipes.cache import catalog_generation
+from recipes.feed import (backfill_feed, clear_feed, fan_out_recipe,
+                          feed_filter, refill_feeds)
+from recipes.images import InvalidImage, decode_base64_image, variant_url
+from recipes.ingredient_index import ingredient_index
+from recipes.memberships import memberships_for
+from recipes.pantry_index import pantry_index
 from recipes.models import (Favorite, Ingredient,
                             Recipe, ShoppingCart,
                             Tag, RecipeIngredient)
-from .serializers import (IngredientSerializer, RecipeSerializer,
-                          RecipeShortSerializer, SubscriptionSerializer,
+from recipes.short_links import encode, resolve
+from recipes.user_lists import add_recipes, remove_recipes
+from .conditional import conditional_get, make_etag
+from .metrics import registry
+from .pagination import (FeedPagination, RecipeKeysetPagination,
+                         SubscriptionKeysetPagination)
+from .response_cache import cache_stats, cached_response
+from .renderers import CSVRenderer, PlainTextRenderer
+from .serializers import (IngredientSerializer, RecipeIdsSerializer,
+                          RecipeSerializer, RecipeShortSerializer,
+                          SubscriptionSerializer,
                           SubscriptionCreateSerializer,
                           SubscriptionDeleteSerializer,
                           TagSerializer, UserCreateSerializer,
                           UserListSerializer, UserRetrieveSerializer,
                           UserSerializer)
+from .utils import SHOPPING_LIST_FORMATS
 
 
 class UserPagination(PageNumberPagination):
@@ -44,12 +65,18 @@ class RecipeViewSet(viewsets.ModelViewSet):
     serializer_class = RecipeSerializer
     pagination_class = RecipePagination
     filter_backends = (DjangoFilterBackend, filters.OrderingFilter)
-    ordering_fields = '__all__'
+    ordering_fields = ('id', 'name', 'popularity')
     permission_classes = [IsAuthenticatedOrReadOnly]
+    # Действия, которые отдают рецепты целиком.
+    related_actions = {
+        'list', 'retrieve', 'update', 'partial_update', 'feed', 'cook_with'
+    }
 
     def get_queryset(self):
-        queryset = super().get_queryset()
         user = self.request.user
+        queryset = super().get_queryset().defer('search_vector')
+        if self.action in self.related_actions:
+            queryset = queryset.with_related()
 
         author_id = self.request.query_params.get('author')
         if author_id is not None:
@@ -57,9 +84,18 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         tags = self.request.query_params.getlist('tags')
         if tags:
-            self.pagination_class = RecipeTagPagination
             queryset = queryset.filter(tags__slug__in=tags).distinct()
 
+        search = self.request.query_params.get('search')
+        if search:
+            queryset = queryset.search(search)
+
+        if self.action == 'list':
+            if 'cursor' in self.request.query_params:
+                self.pagination_class = RecipeKeysetPagination
+            elif tags:
+                self.pagination_class = RecipeTagPagination
+
         is_in_shopping_cart = self.request.query_params.get(
             'is_in_shopping_cart'
         )
@@ -79,11 +115,62 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     def process_image(self, image_data):
         if image_data and image_data.startswith('data:image'):
-            format, imgstr = image_data.split(';base64,')
-            ext = format.split('/')[-1]
-            return ContentFile(base64.b64decode(imgstr), name=f'temp.{ext}')
+            try:
+                return decode_base64_image(image_data, name='temp')
+            except InvalidImage as error:
+                raise ValidationError({'image': [str(error)]})
         return None
 
+    def retrieve(self, request, *args, **kwargs):
+        user = request.user
+        try:
+            state = Recipe.objects.filter(pk=kwargs['pk']).values(
+                'updated_at', 'author_id'
+            ).first()
+        except (TypeError, ValueError):
+            state = None
+        if state is None:
+            raise Http404('Рецепт не найден.')
+        # Поколение каталога меняется и при правке автора, тегов
+        # и ингредиентов, которые не трогают updated_at рецепта.
+        state['generation'] = catalog_generation()
+
+        if user.is_authenticated:
+            state['memberships'] = memberships_for(request).version
+            cache_control = {'private': True, 'no_cache': True}
+        else:
+            cache_control = {
+                'public': True,
+                'max_age': Constants.RECIPE_CACHE_MAX_AGE
+            }
+
+        return conditional_get(
+            request,
+            make_etag('recipe', kwargs['pk'], *state.values()),
+            lambda: cached_response(
+                request,
+                lambda: super(RecipeViewSet, self).retrieve(
+                    request, *args, **kwargs
+                )
+            ),
+            **cache_control
+        )
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(
+            request,
+            lambda: super(RecipeViewSet, self).list(request, *args, **kwargs)
+        )
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='cache-stats',
+        permission_classes=[IsAdminUser]
+    )
+    def cache_stats(self, request):
+        return Response(cache_stats())
+
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
 
@@ -104,6 +191,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
+
         return Response(serializer.data)
 
     def create(self, request, *args, **kwargs):
@@ -130,12 +218,95 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        recipe = serializer.save(author=self.request.user)
+        fan_out_recipe(recipe)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[IsAuthenticated],
+        pagination_class=FeedPagination
+    )
+    def feed(self, request):
+        queryset = self.get_queryset().filter(feed_filter(request.user))
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'], url_path='cook-with')
+    def cook_with(self, request):
+        try:
+            ingredient_ids = [
+                int(value)
+                for value in request.query_params.getlist('ingredients')
+            ]
+        except ValueError:
+            raise ValidationError(
+                {'ingredients': ['Id ингредиентов должны быть числами.']}
+            )
+        if not ingredient_ids:
+            raise ValidationError(
+                {'ingredients': ['Укажите хотя бы один ингредиент.']}
+            )
+        try:
+            limit = min(
+                int(request.query_params.get(
+                    'limit', Constants.PANTRY_RESULTS_LIMIT
+                )),
+                Constants.PANTRY_RESULTS_MAX
+            )
+        except ValueError:
+            raise ValidationError({'limit': ['Введите правильное число.']})
+
+        tags = request.query_params.getlist('tags')
+        tag_ids = list(
+            Tag.objects.filter(slug__in=tags).values_list('id', flat=True)
+        ) if tags else None
+
+        matches = pantry_index.best_matches(ingredient_ids, tag_ids, limit)
+        recipes = {
+            recipe.pk: recipe
+            for recipe in self.get_queryset().filter(
+                pk__in=[recipe_id for recipe_id, _, _ in matches]
+            )
+        }
+        results = []
+        for recipe_id, matched, missing in matches:
+            if recipe_id in recipes:
+                data = self.get_serializer(recipes[recipe_id]).data
+                data['matched_count'] = matched
+                data['missing_count'] = missing
+                results.append(data)
+        return Response(results)
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        try:
+            recipes = list(Recipe.objects.defer('search_vector').filter(
+                similar_to__recipe_id=pk
+            ).annotate(
+                similarity=F('similar_to__score')
+            ).order_by('-similarity', 'id'))
+        except (TypeError, ValueError):
+            raise Http404('Рецепт не найден.')
+        if not recipes and not Recipe.objects.filter(pk=pk).exists():
+            raise Http404('Рецепт не найден.')
+
+        results = []
+        for recipe in recipes:
+            data = RecipeShortSerializer(
+                recipe, context={'request': request}
+            ).data
+            data['similarity'] = round(recipe.similarity, 4)
+            results.append(data)
+        return Response(results)
 
     @action(detail=True, methods=['get'], url_path='get-link')
     def get_short_link(self, request, pk=None):
         recipe = self.get_object()
-        short_link = request.build_absolute_uri(recipe.get_absolute_url())
+        short_link = request.build_absolute_uri(
+            reverse('short-link', kwargs={'code': encode(recipe.pk)})
+        )
         return Response(
             {'short-link': short_link},
             status=status.HTTP_200_OK
@@ -179,40 +350,38 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(
         detail=False,
         methods=['get'],
-        permission_classes=[IsAuthenticated]
+        permission_classes=[IsAuthenticated],
+        renderer_classes=[PlainTextRenderer, CSVRenderer]
     )
     def download_shopping_cart(self, request):
         user = request.user
-        shopping_cart = user.shopping_cart.all()
 
-        if not shopping_cart.exists():
+        if not user.shopping_cart.exists():
             return Response(
                 {'detail': 'Корзина пуста.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        ingredient_totals = defaultdict(int)
-        for item in shopping_cart:
-            recipe = item.recipe
-            ingredients = RecipeIngredient.objects.filter(recipe=recipe)
-
-            for ingredient in ingredients:
-                key = (ingredient.ingredient.name,
-                       ingredient.ingredient.measurement_unit)
-                ingredient_totals[key] += ingredient.amount
-
-        shopping_list = [
-            f"{name} - {amount} {unit}"
-            for (name, unit), amount in ingredient_totals.items()
-        ]
-
-        response = HttpResponse(content_type='text/plain')
-        response[
-            'Content-Disposition'] = 'attachment; filename="shopping_list.txt"'
-        response.write('Список покупок:\n\n')
-        for item in shopping_list:
-            response.write(f'{item}\n')
-
+        rows = RecipeIngredient.objects.filter(
+            recipe__in_shopping_cart__user=user
+        ).values_list(
+            'ingredient__name', 'ingredient__measurement_unit'
+        ).annotate(
+            total=Sum('amount')
+        ).order_by('ingredient__name').iterator()
+        if isinstance(request._request, ASGIRequest):
+            # ASGIHandler перебирает тело ответа в цикле событий,
+            # где запросы к базе запрещены: строки читаются здесь.
+            rows = list(rows)
+
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            SHOPPING_LIST_FORMATS[renderer.format](rows),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{renderer.format}"'
+        )
         return response
 
     @action(
@@ -248,6 +417,51 @@ class RecipeViewSet(viewsets.ModelViewSet):
             user.favorites.remove(recipe)
             return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def update_user_list(self, request, model, counter):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        add = serializer.validated_data['add']
+        remove = serializer.validated_data['remove']
+
+        added = add_recipes(model, counter, request.user, add)
+        removed = remove_recipes(model, counter, request.user, remove)
+        existing = set(Recipe.objects.filter(
+            pk__in=set(add) - added
+        ).values_list('pk', flat=True)) if len(added) < len(set(add)) else ()
+
+        results = [
+            {'id': pk, 'status': (
+                'added' if pk in added
+                else 'exists' if pk in existing
+                else 'not_found'
+            )}
+            for pk in add
+        ] + [
+            {'id': pk, 'status': 'removed' if pk in removed else 'absent'}
+            for pk in remove
+        ]
+        return Response({'results': results})
+
+    @action(
+        detail=False,
+        methods=['post'],
+        permission_classes=[IsAuthenticated],
+        url_path='favorite/bulk'
+    )
+    def bulk_favorite(self, request):
+        return self.update_user_list(request, Favorite, 'favorites_count')
+
+    @action(
+        detail=False,
+        methods=['post'],
+        permission_classes=[IsAuthenticated],
+        url_path='shopping_cart/bulk'
+    )
+    def bulk_shopping_cart(self, request):
+        return self.update_user_list(
+            request, ShoppingCart, 'in_carts_count'
+        )
+
     def destroy(self, request, pk=None):
         recipe = self.get_object()
 
@@ -261,23 +475,55 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics(request):
+    return HttpResponse(
+        registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+def short_link_redirect(request, code):
+    pk = resolve(code)
+    if pk is None:
+        raise Http404('Рецепт не найден.')
+    return HttpResponseRedirect(f'/recipes/{pk}')
+
+
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        version = Tag.objects.aggregate(
+            count=Count('id'), updated_at=Max('updated_at')
+        )
+        return conditional_get(
+            request,
+            make_etag('tags', *version.values()),
+            lambda: super(TagViewSet, self).list(request, *args, **kwargs),
+            public=True,
+            max_age=Constants.CATALOG_CACHE_MAX_AGE
+        )
+
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
 
-    def get_queryset(self):
-        queryset = Ingredient.objects.all()
-        name = self.request.query_params.get('name')
-        if name:
-            queryset = queryset.filter(name__istartswith=name)
-        return queryset
+    def list(self, request, *args, **kwargs):
+        return conditional_get(
+            request,
+            make_etag('ingredients', *ingredient_index.version),
+            lambda: Response(ingredient_index.search(
+                request.query_params.get('name', '')
+            )),
+            public=True,
+            max_age=Constants.CATALOG_CACHE_MAX_AGE
+        )
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -334,17 +580,22 @@ class UserViewSet(viewsets.ModelViewSet):
         if request.method == 'PUT':
             avatar_data = request.data.get('avatar', None)
             if avatar_data:
-                format, imgstr = avatar_data.split(';base64,')
-                ext = format.split('/')[-1]
-                avatar = ContentFile(
-                    base64.b64decode(imgstr),
-                    name=f'{user.username}_avatar.{ext}'
-                )
+                try:
+                    avatar = decode_base64_image(
+                        avatar_data, name=f'{user.username}_avatar'
+                    )
+                except InvalidImage as error:
+                    return Response(
+                        {'avatar': [str(error)]},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
                 user.avatar = avatar
                 user.save()
 
                 return Response(
-                    {'avatar': request.build_absolute_uri(user.avatar.url)},
+                    {'avatar': request.build_absolute_uri(
+                        variant_url(user.avatar, 'avatar')
+                    )},
                     status=status.HTTP_200_OK
                 )
             return Response(
@@ -354,7 +605,7 @@ class UserViewSet(viewsets.ModelViewSet):
 
         elif request.method == 'DELETE':
             if user.avatar:
-                user.avatar.delete()
+                user.avatar = None
                 user.save()
                 return Response(
                     {'avatar': None},
@@ -399,6 +650,7 @@ class UserViewSet(viewsets.ModelViewSet):
             serializer.is_valid(raise_exception=True)
 
             Subscription.objects.create(user=user, author=author)
+            backfill_feed(user, author)
 
             recipes_limit = request.query_params.get('recipes_limit', None)
             context = {'request': request}
@@ -418,6 +670,8 @@ class UserViewSet(viewsets.ModelViewSet):
             )
             serializer.is_valid(raise_exception=True)
             user.follower.filter(author=author).delete()
+            clear_feed(user, author)
+            refill_feeds(author)
 
             return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -427,11 +681,22 @@ class UserViewSet(viewsets.ModelViewSet):
         permission_classes=[IsAuthenticated]
     )
     def subscriptions(self, request):
-        follows = Subscription.objects.filter(
-            user=request.user
-        ).select_related('author')
-        authors = [follow.author for follow in follows]
+        if 'cursor' in request.query_params:
+            self.pagination_class = SubscriptionKeysetPagination
+
+        authors = User.objects.filter(
+            following__user=request.user
+        ).annotate(
+            is_subscribed=Value(True, output_field=BooleanField())
+        ).order_by('username', 'id')
         pages = self.paginate_queryset(authors)
+
+        recipes = Recipe.objects.filter(author__in=pages)
+        recipes_limit = request.query_params.get('recipes_limit')
+        if recipes_limit and recipes_limit.isdigit():
+            recipes = recipes.first_per_author(int(recipes_limit))
+        prefetch_related_objects(pages, Prefetch('recipe', queryset=recipes))
+
         serializer = SubscriptionSerializer(
             pages,
             many=True,
@@ -0,0 +1,13 @@
+from django.urls import path
+
+from api import async_views
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/tags/', async_views.tag_list),
+    path('api/ingredients/', async_views.ingredient_list),
+    path('api/recipes/<int:pk>/', async_views.recipe_detail),
+    path('s/<str:code>', async_views.short_link),
+    *sync_urlpatterns,
+]
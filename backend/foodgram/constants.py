@@ -8,3 +8,25 @@ class Constants():
     COOKING_TIME_MAX = 32000
     AMOUNT_MIN = 1
     AMOUNT_MAX = 32000
+    INGREDIENT_INDEX_TTL = 300
+    FEED_FAN_OUT_LIMIT = 10000
+    FEED_BATCH_SIZE = 1000
+    FEED_BACKFILL_SIZE = 50
+    SHORT_LINK_CACHE_SIZE = 10000
+    CATALOG_CACHE_MAX_AGE = 300
+    RECIPE_CACHE_MAX_AGE = 60
+    RECIPE_RESPONSE_CACHE_TIMEOUT = 600
+    SEARCH_CONFIG = 'russian'
+    SEARCH_VECTOR_BATCH_SIZE = 10000
+    PANTRY_INDEX_TTL = 300
+    PANTRY_RESULTS_LIMIT = 10
+    PANTRY_RESULTS_MAX = 50
+    SIMILAR_RECIPES_TOP_K = 10
+    SIMILAR_MAX_POSTING = 5000
+    SIMILAR_BATCH_SIZE = 5000
+    POPULARITY_HALF_LIFE_DAYS = 14
+    POPULARITY_FAVORITE_WEIGHT = 2.0
+    POPULARITY_CART_WEIGHT = 1.0
+    BULK_RECIPES_MAX = 500
+    MEMBERSHIP_CACHE_TIMEOUT = 3600
+    MEMBERSHIP_LOCAL_CACHE_TIMEOUT = 5
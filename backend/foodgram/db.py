@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+
+
+class HealthCheckMixin:
+    """Checks a persistent connection on its first use in a request.
+
+    Stands in for CONN_HEALTH_CHECKS from Django 4.1: requests that
+    never touch the database pay nothing.
+    """
+    health_check_done = True
+
+    def close_if_health_check_failed(self):
+        if self.connection is None or self.health_check_done:
+            return
+        self.health_check_done = True
+        if not self.in_atomic_block and not self.is_usable():
+            self.close()
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
+
+
+def schedule_health_checks(**kwargs):
+    for connection in connections.all():
+        connection.health_check_done = False
+
+
+if settings.DB_CONN_HEALTH_CHECKS:
+    request_started.connect(schedule_health_checks)
@@ -0,0 +1,90 @@
+import threading
+
+import psycopg2
+import psycopg2.extras
+from django.db.backends.postgresql import base
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def is_usable(connection):
+    if connection.closed:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        if not connection.autocommit:
+            connection.rollback()
+    except psycopg2.Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_pool(self, conn_params):
+        with _pools_lock:
+            pool = _pools.get(self.alias)
+            if pool is None:
+                options = self.settings_dict.get('POOL', {})
+                max_size = options.get('MAX_SIZE', 10)
+                pool = ThreadedConnectionPool(
+                    options.get('MIN_SIZE', 1), max_size, **conn_params
+                )
+                # getconn не ждёт свободного соединения, а сразу падает
+                # с PoolError: потоки сверх размера пула ждут здесь.
+                pool.slots = threading.BoundedSemaphore(max_size)
+                _pools[self.alias] = pool
+            return pool
+
+    def checkout(self, pool):
+        timeout = self.settings_dict.get('POOL', {}).get('TIMEOUT', 30)
+        if not pool.slots.acquire(timeout=timeout):
+            raise PoolError('Нет свободных соединений с базой данных.')
+        try:
+            connection = pool.getconn()
+            while not is_usable(connection):
+                pool.putconn(connection, close=True)
+                connection = pool.getconn()
+        except BaseException:
+            pool.slots.release()
+            raise
+        self.pooled_connection = connection
+        return connection
+
+    def get_new_connection(self, conn_params):
+        connection = self.checkout(self.get_pool(conn_params))
+        try:
+            self.init_pooled_connection(connection)
+        except BaseException:
+            self._close()
+            raise
+        return connection
+
+    def init_pooled_connection(self, connection):
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        psycopg2.extras.register_default_jsonb(
+            conn_or_curs=connection, loads=lambda x: x
+        )
+
+    def _close(self):
+        # Закрытие внутри atomic оставляет self.connection: второй
+        # вызов не должен вернуть соединение в пул ещё раз.
+        connection = getattr(self, 'pooled_connection', None)
+        if connection is None:
+            return
+        self.pooled_connection = None
+        pool = _pools[self.alias]
+        try:
+            with self.wrap_database_errors:
+                pool.putconn(connection)
+        finally:
+            pool.slots.release()
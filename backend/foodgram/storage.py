@@ -0,0 +1,48 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+
+
+def is_content_address(name):
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return (
+        len(stem) == 64
+        and os.path.basename(directory) == stem[:2]
+        and all(char in '0123456789abcdef' for char in stem)
+    )
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # FileSystemStorage._save просит другое имя, если файл уже создан.
+        # Для адреса по содержимому это значит, что такой же файл
+        # записал параллельный запрос: прерываем цикл повторов.
+        if is_content_address(name) and self.exists(name):
+            raise FileExistsError(name)
+        return name
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        hexdigest = digest.hexdigest()
+        name = os.path.join(
+            directory, hexdigest[:2], f'{hexdigest}{extension}'
+        )
+        if self.exists(name):
+            # Свежая дата защищает файл от collect_media_garbage --min-age.
+            os.utime(self.path(name))
+            return name
+        try:
+            return super()._save(name, content)
+        except FileExistsError:
+            return name
+
+
+content_storage = ContentAddressedStorage()
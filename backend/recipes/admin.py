@@ -28,6 +28,8 @@ class RecipeAdmin(ModelAdmin):
         'cooking_time',
         'get_ingredients',
         'get_tags',
+        'favorites_count',
+        'in_carts_count',
     )
     list_filter = ('author', 'tags', 'cooking_time')
     search_fields = ('name', 'author__username', 'ingredients__name')
@@ -38,6 +40,11 @@ class RecipeAdmin(ModelAdmin):
         queryset = queryset.prefetch_related('ingredients', 'tags', 'author')
         return queryset
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return queryset.search(search_term), False
+
     def get_ingredients(self, obj):
         return ", ".join(
             [ingredient.name for ingredient in obj.ingredients.all()]
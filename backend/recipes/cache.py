@@ -0,0 +1,16 @@
+import time
+
+from django.core.cache import cache
+
+GENERATION_KEY = 'recipes:generation'
+
+
+def catalog_generation():
+    return cache.get_or_set(GENERATION_KEY, time.time_ns, timeout=None)
+
+
+def bump_catalog_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, time.time_ns(), timeout=None)
@@ -0,0 +1,92 @@
+from django.db.models import Q
+
+from foodgram.constants import Constants
+from user.models import Subscription, User
+
+from .models import FeedEntry, Recipe
+
+
+def fans_out_on_write(author):
+    return author.followers_count <= Constants.FEED_FAN_OUT_LIMIT
+
+
+def fan_out_recipe(recipe):
+    if not fans_out_on_write(recipe.author):
+        return
+
+    followers = Subscription.objects.filter(
+        author_id=recipe.author_id
+    ).values_list('user_id', flat=True).iterator()
+
+    batch = []
+    for user_id in followers:
+        batch.append(FeedEntry(
+            user_id=user_id, recipe=recipe, author_id=recipe.author_id
+        ))
+        if len(batch) >= Constants.FEED_BATCH_SIZE:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def backfill_feed(user, author):
+    if not fans_out_on_write(author):
+        return
+
+    recent = Recipe.objects.filter(author=author).order_by(
+        '-id'
+    ).values_list('id', flat=True)[:Constants.FEED_BACKFILL_SIZE]
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(user=user, recipe_id=recipe_id, author=author)
+            for recipe_id in recent
+        ],
+        ignore_conflicts=True
+    )
+
+
+def refill_feeds(author):
+    """Backfills followers' feeds when the author drops to the limit.
+
+    Recipes published above the limit were pulled, not fanned out, and
+    would vanish from the feeds once pull stops.
+    """
+    followers_count = User.objects.filter(pk=author.pk).values_list(
+        'followers_count', flat=True
+    ).first()
+    if followers_count != Constants.FEED_FAN_OUT_LIMIT:
+        return
+
+    recent = list(Recipe.objects.filter(author=author).order_by(
+        '-id'
+    ).values_list('id', flat=True)[:Constants.FEED_BACKFILL_SIZE])
+    followers = Subscription.objects.filter(
+        author=author
+    ).values_list('user_id', flat=True).iterator()
+
+    batch = []
+    for user_id in followers:
+        batch.extend(
+            FeedEntry(user_id=user_id, recipe_id=recipe_id, author=author)
+            for recipe_id in recent
+        )
+        if len(batch) >= Constants.FEED_BATCH_SIZE:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def clear_feed(user, author):
+    FeedEntry.objects.filter(user=user, author=author).delete()
+
+
+def feed_filter(user):
+    pulled_authors = list(Subscription.objects.filter(
+        user=user,
+        author__followers_count__gt=Constants.FEED_FAN_OUT_LIMIT
+    ).values_list('author_id', flat=True))
+    if not pulled_authors:
+        return Q(feed_entries__user=user)
+    return Q(
+        pk__in=FeedEntry.objects.filter(user=user).values('recipe')
+    ) | Q(author_id__in=pulled_authors)
@@ -0,0 +1,166 @@
+import base64
+import binascii
+import logging
+import os
+import queue
+import threading
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, connection
+from PIL import Image, UnidentifiedImageError, features
+
+DECODE_CHUNK_SIZE = 64 * 1024
+SPOOL_MAX_SIZE = 1024 * 1024
+WHITESPACE = str.maketrans('', '', ' \t\n\r\x0b\x0c')
+logger = logging.getLogger(__name__)
+
+ALLOWED_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+VARIANTS = {
+    'thumbnail': (320, 320),
+    'detail': (960, 960),
+    'avatar': (160, 160),
+}
+RECIPE_VARIANTS = ('thumbnail', 'detail')
+AVATAR_VARIANTS = ('avatar',)
+
+if features.check('webp'):
+    VARIANT_FORMAT, VARIANT_EXTENSION = 'WEBP', 'webp'
+else:
+    VARIANT_FORMAT, VARIANT_EXTENSION = 'JPEG', 'jpg'
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def decode_base64_image(data, name):
+    try:
+        header, encoded = data.split(';base64,', 1)
+    except (AttributeError, ValueError):
+        raise InvalidImage('Изображение должно быть передано в base64.')
+    if not header.startswith('data:image'):
+        raise InvalidImage('Передан не файл изображения.')
+
+    decoded = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    try:
+        # Base64 может быть разбит на строки: пробельные символы
+        # убираются, а куски выравниваются по четыре символа.
+        tail = ''
+        for start in range(0, len(encoded), DECODE_CHUNK_SIZE):
+            chunk = tail + encoded[
+                start:start + DECODE_CHUNK_SIZE
+            ].translate(WHITESPACE)
+            aligned = len(chunk) - len(chunk) % 4
+            decoded.write(base64.b64decode(chunk[:aligned], validate=True))
+            tail = chunk[aligned:]
+        decoded.write(base64.b64decode(tail, validate=True))
+        decoded.seek(0)
+        with Image.open(decoded) as image:
+            image_format = image.format
+            image.verify()
+    except (binascii.Error, UnidentifiedImageError, OSError,
+            Image.DecompressionBombError):
+        decoded.close()
+        raise InvalidImage('Некорректное изображение.')
+
+    if image_format not in ALLOWED_FORMATS:
+        decoded.close()
+        raise InvalidImage('Неподдерживаемый формат изображения.')
+
+    decoded.seek(0)
+    return File(decoded, name=f'{name}.{ALLOWED_FORMATS[image_format]}')
+
+
+def variant_name(name, variant):
+    stem, _ = os.path.splitext(name)
+    return f'variants/{variant}/{stem}.{VARIANT_EXTENSION}'
+
+
+def variants_field(image):
+    # Поле <поле картинки>_variants хранит имя файла, для которого
+    # варианты уже готовы: при чтении файловая система не нужна.
+    return f'{image.field.name}_variants'
+
+
+def variant_url(image, variant):
+    if getattr(image.instance, variants_field(image), '') == image.name:
+        return default_storage.url(variant_name(image.name, variant))
+    return image.url
+
+
+def mark_variants_ready(model, field, name):
+    model._default_manager.filter(**{field: name}).exclude(
+        **{f'{field}_variants': name}
+    ).update(**{f'{field}_variants': name})
+
+
+def flatten(image):
+    """Converts to RGB, putting transparent areas on white."""
+    if image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    ):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def build_variants(name, variants, force=False):
+    with default_storage.open(name) as source, Image.open(source) as image:
+        image.load()
+        for variant in variants:
+            target = variant_name(name, variant)
+            if default_storage.exists(target):
+                if not force:
+                    continue
+                default_storage.delete(target)
+            resized = flatten(image)
+            resized.thumbnail(VARIANTS[variant])
+            buffer = BytesIO()
+            resized.save(buffer, VARIANT_FORMAT, quality=85)
+            default_storage.save(target, ContentFile(buffer.getvalue()))
+
+
+_jobs = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _work():
+    while True:
+        model, field, name, variants = _jobs.get()
+        try:
+            build_variants(name, variants)
+            mark_variants_ready(model, field, name)
+        except (OSError, UnidentifiedImageError, DatabaseError):
+            logger.exception('Не удалось подготовить варианты %s', name)
+        finally:
+            connection.close()
+            _jobs.task_done()
+
+
+def schedule_variants(image, variants):
+    global _worker
+    if not image or getattr(
+        image.instance, variants_field(image), ''
+    ) == image.name:
+        return
+    model, field = type(image.instance), image.field.name
+    if all(
+        default_storage.exists(variant_name(image.name, variant))
+        for variant in variants
+    ):
+        setattr(image.instance, variants_field(image), image.name)
+        mark_variants_ready(model, field, image.name)
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_work, daemon=True)
+            _worker.start()
+    _jobs.put((model, field, image.name, variants))
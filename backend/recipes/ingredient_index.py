@@ -0,0 +1,93 @@
+import threading
+import time
+from bisect import bisect_left
+
+from foodgram.constants import Constants
+
+from .models import Ingredient
+
+
+class IngredientIndex:
+    def __init__(self, ttl=Constants.INGREDIENT_INDEX_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # Кортеж (keys, items, version, built_at) заменяется целиком:
+        # читатели берут его без блокировки.
+        self._snapshot = None
+        self._stale = True
+
+    def invalidate(self):
+        self._stale = True
+
+    def is_fresh(self, snapshot):
+        return (
+            snapshot is not None
+            and not self._stale
+            and time.monotonic() - snapshot[3] <= self.ttl
+        )
+
+    def is_stale(self):
+        return not self.is_fresh(self._snapshot)
+
+    def current(self):
+        """Returns the snapshot if it is fresh; never queries the database."""
+        snapshot = self._snapshot
+        return snapshot if self.is_fresh(snapshot) else None
+
+    def _load(self):
+        snapshot = self._snapshot
+        if self.is_fresh(snapshot):
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if self.is_fresh(snapshot):
+                return snapshot
+            # Сброс до запроса: invalidate() во время загрузки
+            # снова пометит индекс устаревшим.
+            self._stale = False
+            try:
+                rows = list(Ingredient.objects.values_list(
+                    'id', 'name', 'measurement_unit', 'updated_at'
+                ))
+            except BaseException:
+                self._stale = True
+                raise
+            entries = sorted(
+                (name.lower(), pk, name, unit)
+                for pk, name, unit, _ in rows
+            )
+            snapshot = (
+                tuple(entry[0] for entry in entries),
+                tuple(
+                    {'id': pk, 'name': name, 'measurement_unit': unit}
+                    for _, pk, name, unit in entries
+                ),
+                (len(rows), max((row[3] for row in rows), default=None)),
+                time.monotonic(),
+            )
+            self._snapshot = snapshot
+            return snapshot
+
+    @property
+    def version(self):
+        return self._load()[2]
+
+    def search(self, query='', snapshot=None):
+        keys, items = (snapshot or self._load())[:2]
+        query = query.lower()
+        if not query:
+            return list(items)
+
+        start = end = bisect_left(keys, query)
+        while end < len(keys) and keys[end].startswith(query):
+            end += 1
+
+        substring_hits = [
+            items[position]
+            for position in (*range(start), *range(end, len(keys)))
+            if query in keys[position]
+        ]
+        return list(items[start:end]) + substring_hits
+
+
+ingredient_index = IngredientIndex()
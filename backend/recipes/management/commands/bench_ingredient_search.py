@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает поиск ингредиентов через ORM и через индекс в памяти.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--prefix-length', type=int, default=3)
+
+    def handle(self, *args, **options):
+        names = Ingredient.objects.values_list('name', flat=True)
+        queries = [
+            name[:options['prefix_length']]
+            for name in names[:options['queries']]
+        ]
+        if not queries:
+            self.stderr.write('Каталог ингредиентов пуст.')
+            return
+
+        def orm_search(query):
+            return list(Ingredient.objects.filter(
+                name__istartswith=query
+            ).values('id', 'name', 'measurement_unit'))
+
+        ingredient_index.invalidate()
+        ingredient_index.search()
+
+        for label, search in (
+            ('orm', orm_search),
+            ('index', ingredient_index.search),
+        ):
+            started = time.perf_counter()
+            for query in queries:
+                search(query)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{label}: {len(queries)} запросов за {elapsed:.3f} с, '
+                f'{len(queries) / elapsed:.0f} запросов/с'
+            )
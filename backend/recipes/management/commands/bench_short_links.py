@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from recipes.models import Recipe
+from recipes.short_links import encode, resolved_links
+
+
+class Command(BaseCommand):
+    help = 'Измеряет пропускную способность редиректа коротких ссылок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--recipes', type=int, default=100)
+        parser.add_argument('--host', default='localhost')
+
+    def handle(self, *args, **options):
+        urls = [
+            reverse('short-link', kwargs={'code': encode(pk)})
+            for pk in Recipe.objects.values_list(
+                'pk', flat=True
+            )[:options['recipes']]
+        ]
+        if not urls:
+            self.stderr.write('Нет рецептов для измерения.')
+            return
+
+        client = Client(SERVER_NAME=options['host'])
+        total = options['requests']
+        for label, cold in (('без кэша', True), ('с кэшем', False)):
+            resolved_links.clear()
+            started = time.perf_counter()
+            for number in range(total):
+                if cold:
+                    resolved_links.clear()
+                client.get(urls[number % len(urls)])
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{label}: {total} редиректов за {elapsed:.3f} с, '
+                f'{total / elapsed:.0f} в секунду'
+            )
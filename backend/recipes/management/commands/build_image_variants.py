@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from PIL import UnidentifiedImageError
+
+from recipes.images import (AVATAR_VARIANTS, RECIPE_VARIANTS, build_variants,
+                            mark_variants_ready)
+from recipes.models import Recipe
+from user.models import User
+
+
+class Command(BaseCommand):
+    help = 'Готовит уменьшенные варианты картинок рецептов и аватаров.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересоздать уже существующие варианты.'
+        )
+
+    def handle(self, *args, **options):
+        sources = (
+            (Recipe.objects.exclude(image=''), 'image', RECIPE_VARIANTS),
+            (
+                User.objects.exclude(avatar='').exclude(avatar=None),
+                'avatar',
+                AVATAR_VARIANTS
+            ),
+        )
+        built = failed = 0
+        for queryset, field, variants in sources:
+            for name in queryset.values_list(field, flat=True).iterator():
+                try:
+                    build_variants(name, variants, force=options['force'])
+                except (OSError, UnidentifiedImageError) as error:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+                else:
+                    mark_variants_ready(queryset.model, field, name)
+                    built += 1
+        self.stdout.write(f'Обработано файлов: {built}, с ошибками: {failed}.')
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Max, Q
+
+from foodgram.constants import Constants
+from recipes.models import Recipe
+from recipes.similarity import METRICS, RecipeSimilarity
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает похожие рецепты по ингредиентам и тегам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--metric', choices=sorted(METRICS), default='jaccard'
+        )
+        parser.add_argument(
+            '--top-k', type=int, default=Constants.SIMILAR_RECIPES_TOP_K
+        )
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Только новые и изменённые рецепты и их соседи.'
+        )
+
+    def handle(self, *args, **options):
+        similarity = RecipeSimilarity(
+            metric=options['metric'], top_k=options['top_k']
+        ).load()
+
+        if options['incremental']:
+            changed = list(Recipe.objects.annotate(
+                built_at=Max('similar_recipes__built_at')
+            ).filter(
+                Q(built_at__isnull=True) | Q(updated_at__gt=F('built_at'))
+            ).values_list('id', flat=True))
+            recipe_ids = similarity.affected(changed)
+            self.stdout.write(f'Изменённых рецептов: {len(changed)}.')
+        else:
+            recipe_ids = Recipe.objects.values_list('id', flat=True)
+
+        saved = similarity.save(recipe_ids)
+        self.stdout.write(
+            f'Пересчитано рецептов: {len(recipe_ids)}, связей: {saved}.'
+        )
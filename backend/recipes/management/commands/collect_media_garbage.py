@@ -0,0 +1,67 @@
+import os
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from foodgram.storage import content_storage
+from recipes.images import VARIANTS, variant_name
+from recipes.models import Recipe
+from user.models import User
+
+
+def walk(storage, path=''):
+    directories, files = storage.listdir(path)
+    for filename in files:
+        yield os.path.join(path, filename)
+    for directory in directories:
+        yield from walk(storage, os.path.join(path, directory))
+
+
+class Command(BaseCommand):
+    help = 'Удаляет файлы из media, на которые не ссылается ни одна запись.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать файлы, которые будут удалены.'
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=3600,
+            help='Не трогать файлы моложе указанного числа секунд.'
+        )
+
+    def handle(self, *args, **options):
+        references = Counter(
+            Recipe.objects.exclude(image='').values_list('image', flat=True)
+        )
+        references.update(
+            User.objects.exclude(avatar='').exclude(
+                avatar=None
+            ).values_list('avatar', flat=True)
+        )
+        for name in list(references):
+            for variant in VARIANTS:
+                references[variant_name(name, variant)] += references[name]
+
+        storage = content_storage
+        deadline = timezone.now() - timedelta(seconds=options['min_age'])
+        removed = freed = 0
+        for name in walk(storage):
+            if references[name] or storage.get_modified_time(name) > deadline:
+                continue
+            size = storage.size(name)
+            self.stdout.write(name)
+            if not options['dry_run']:
+                storage.delete(name)
+            removed += 1
+            freed += size
+
+        verb = 'Найдено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(
+            f'{verb} файлов: {removed}, освобождено байт: {freed}.'
+        )
@@ -0,0 +1,163 @@
+import csv
+import io
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def read_json(file):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    while True:
+        chunk = file.read(READ_CHUNK_SIZE)
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if not started and position < len(buffer):
+                if buffer[position] != '[':
+                    raise CommandError('Ожидался JSON-массив ингредиентов.')
+                started = True
+                position += 1
+                continue
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            fields = item.get('fields', item)
+            yield fields['name'], fields['measurement_unit']
+        if not chunk:
+            # Закрывающая скобка не встретилась: файл обрезан или
+            # повреждён, частичный каталог не сохраняем.
+            raise CommandError('Некорректный или неполный JSON-файл.')
+
+
+READERS = {'csv': read_csv, 'json': read_json}
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = {}
+        for name, unit in islice(rows, size):
+            batch[name.strip()] = unit.strip()
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = 'Загружает каталог ингредиентов из CSV или JSON пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=settings.BASE_DIR / 'ingredients_formatted.json'
+        )
+        parser.add_argument('--format', choices=READERS)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f'Файл {path} не найден.')
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {file_format}.')
+
+        started = time.perf_counter()
+        with open(path, encoding='utf-8') as file, transaction.atomic():
+            rows = batches(READERS[file_format](file), options['batch_size'])
+            if connection.vendor == 'postgresql':
+                total = self.copy_upsert(rows)
+            else:
+                total = self.bulk_upsert(rows)
+        ingredient_index.invalidate()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Загружено строк: {total} за {elapsed:.2f} с '
+            f'({total / elapsed if elapsed else total:.0f} строк/с).'
+        )
+
+    def copy_upsert(self, rows):
+        table = Ingredient._meta.db_table
+        name = Ingredient._meta.get_field('name').column
+        unit = Ingredient._meta.get_field('measurement_unit').column
+        updated_at = Ingredient._meta.get_field('updated_at').column
+        total = 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE ingredient_staging '
+                f'({name} text, {unit} text) ON COMMIT DROP'
+            )
+            for batch in rows:
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch.items())
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f'COPY ingredient_staging ({name}, {unit}) '
+                    f'FROM STDIN WITH (FORMAT csv)',
+                    buffer
+                )
+                total += len(batch)
+            cursor.execute(
+                f'INSERT INTO {table} ({name}, {unit}, {updated_at}) '
+                f'SELECT DISTINCT ON ({name}) {name}, {unit}, now() '
+                f'FROM ingredient_staging ORDER BY {name} '
+                f'ON CONFLICT ({name}) DO UPDATE '
+                f'SET {unit} = EXCLUDED.{unit}, '
+                f'{updated_at} = EXCLUDED.{updated_at} '
+                f'WHERE {table}.{unit} IS DISTINCT FROM EXCLUDED.{unit}'
+            )
+        return total
+
+    def bulk_upsert(self, rows):
+        total = 0
+        for batch in rows:
+            existing = Ingredient.objects.in_bulk(
+                list(batch), field_name='name'
+            )
+            Ingredient.objects.bulk_create(
+                [
+                    Ingredient(name=name, measurement_unit=unit)
+                    for name, unit in batch.items()
+                    if name not in existing
+                ],
+                ignore_conflicts=True
+            )
+            changed = []
+            now = timezone.now()
+            for name, ingredient in existing.items():
+                if ingredient.measurement_unit != batch[name]:
+                    ingredient.measurement_unit = batch[name]
+                    ingredient.updated_at = now
+                    changed.append(ingredient)
+            Ingredient.objects.bulk_update(
+                changed, ['measurement_unit', 'updated_at']
+            )
+            total += len(batch)
+        return total
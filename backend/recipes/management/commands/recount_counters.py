@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from user.models import Subscription, User
+
+
+def count_subquery(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=Count('pk')
+            ).values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики рецептов и авторов.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recipes = Recipe.objects.update(
+                favorites_count=count_subquery(Favorite, 'recipe'),
+                in_carts_count=count_subquery(ShoppingCart, 'recipe'),
+            )
+            users = User.objects.update(
+                recipes_count=count_subquery(Recipe, 'author'),
+                followers_count=count_subquery(Subscription, 'author'),
+            )
+        self.stdout.write(
+            f'Пересчитано рецептов: {recipes}, пользователей: {users}.'
+        )
@@ -0,0 +1,99 @@
+import math
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from foodgram.constants import Constants
+from recipes.cache import bump_catalog_generation
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+# Вклад события растёт как 2 ** (t / half_life) от фиксированной даты:
+# порядок такой же, как при затухании всех оценок к текущему моменту,
+# но оценки рецептов без новых событий при пересчёте не меняются.
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+RATE = math.log(2) / (Constants.POPULARITY_HALF_LIFE_DAYS * 24 * 3600)
+TOLERANCE = 1e-9
+
+UPDATE_SQL = '''
+WITH events AS (
+    SELECT recipe_id, %(favorite)s * EXP(
+        %(rate)s * EXTRACT(EPOCH FROM added_at - %(epoch)s)
+    ) AS weight
+    FROM {favorite}
+    UNION ALL
+    SELECT recipe_id, %(cart)s * EXP(
+        %(rate)s * EXTRACT(EPOCH FROM added_at - %(epoch)s)
+    )
+    FROM {cart}
+), scores AS (
+    SELECT recipe.id, COALESCE(SUM(events.weight), 0) AS score
+    FROM {recipe} AS recipe
+    LEFT JOIN events ON events.recipe_id = recipe.id
+    GROUP BY recipe.id
+)
+UPDATE {recipe} AS recipe
+SET popularity = scores.score
+FROM scores
+WHERE recipe.id = scores.id
+  AND ABS(recipe.popularity - scores.score)
+      > %(tolerance)s * GREATEST(recipe.popularity, scores.score)
+'''
+
+
+def event_weight(added_at, weight):
+    return weight * math.exp(RATE * (added_at - EPOCH).total_seconds())
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает популярность рецептов с затуханием по времени.'
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'postgresql':
+            updated = self.update_in_database()
+        else:
+            updated = self.update_in_python()
+        if updated:
+            bump_catalog_generation()
+        self.stdout.write(f'Обновлено рецептов: {updated}.')
+
+    def update_in_database(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                UPDATE_SQL.format(
+                    favorite=Favorite._meta.db_table,
+                    cart=ShoppingCart._meta.db_table,
+                    recipe=Recipe._meta.db_table,
+                ),
+                {
+                    'favorite': Constants.POPULARITY_FAVORITE_WEIGHT,
+                    'cart': Constants.POPULARITY_CART_WEIGHT,
+                    'rate': RATE,
+                    'epoch': EPOCH,
+                    'tolerance': TOLERANCE,
+                }
+            )
+            return cursor.rowcount
+
+    def update_in_python(self):
+        scores = defaultdict(float)
+        for model, weight in (
+            (Favorite, Constants.POPULARITY_FAVORITE_WEIGHT),
+            (ShoppingCart, Constants.POPULARITY_CART_WEIGHT),
+        ):
+            rows = model.objects.values_list('recipe_id', 'added_at')
+            for recipe_id, added_at in rows.iterator():
+                scores[recipe_id] += event_weight(added_at, weight)
+
+        changed = []
+        for recipe in Recipe.objects.only('id', 'popularity').iterator():
+            score = scores.get(recipe.pk, 0.0)
+            if abs(recipe.popularity - score) > TOLERANCE * max(
+                recipe.popularity, score
+            ):
+                recipe.popularity = score
+                changed.append(recipe)
+        with transaction.atomic():
+            Recipe.objects.bulk_update(changed, ['popularity'], 1000)
+        return len(changed)
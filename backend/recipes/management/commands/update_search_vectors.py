@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+
+from foodgram.constants import Constants
+from recipes.models import Recipe
+from recipes.search import update_search_vectors
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает поисковые векторы рецептов пачками по id.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=Constants.SEARCH_VECTOR_BATCH_SIZE
+        )
+        parser.add_argument(
+            '--missing', action='store_true',
+            help='Только рецепты без вектора.'
+        )
+
+    def handle(self, *args, **options):
+        last_id = Recipe.objects.aggregate(last=Max('id'))['last'] or 0
+        batch_size = options['batch_size']
+        updated = 0
+        for start in range(0, last_id, batch_size):
+            queryset = Recipe.objects.filter(
+                id__gt=start, id__lte=start + batch_size
+            )
+            if options['missing']:
+                queryset = queryset.filter(search_vector__isnull=True)
+            updated += update_search_vectors(queryset)
+        self.stdout.write(f'Обновлено рецептов: {updated}.')
@@ -0,0 +1,100 @@
+import time
+from array import array
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from foodgram.constants import Constants
+from user.models import Subscription
+
+from .models import Favorite, ShoppingCart
+
+SOURCES = {
+    'favorites': (Favorite, 'recipe_id'),
+    'cart': (ShoppingCart, 'recipe_id'),
+    'following': (Subscription, 'author_id'),
+}
+
+
+def version_key(user_id):
+    return f'memberships:version:{user_id}'
+
+
+def membership_version(user_id):
+    key = version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Новое значение не совпадёт с версией вытесненных записей.
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_membership_version(user_id):
+    try:
+        cache.incr(version_key(user_id))
+    except ValueError:
+        cache.add(version_key(user_id), time.time_ns(), timeout=None)
+
+
+def invalidate_memberships(user_id):
+    # До фиксации параллельный запрос прочитал бы старые списки
+    # и сохранил их под новой версией.
+    transaction.on_commit(lambda: bump_membership_version(user_id))
+
+
+class Memberships:
+    """Favorite, cart and followed-author ids of one user."""
+
+    def __init__(self, version=None, **ids):
+        self.version = version
+        self._ids = {
+            kind: frozenset(ids.get(kind, ())) for kind in SOURCES
+        }
+
+    def has_favorite(self, recipe_id):
+        return recipe_id in self._ids['favorites']
+
+    def has_in_cart(self, recipe_id):
+        return recipe_id in self._ids['cart']
+
+    def follows(self, author_id):
+        return author_id in self._ids['following']
+
+
+def cache_timeout():
+    # Локальный кэш у каждого процесса свой: версию, поднятую в другом
+    # воркере, он не увидит, поэтому записи живут недолго.
+    if isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache):
+        return Constants.MEMBERSHIP_LOCAL_CACHE_TIMEOUT
+    return Constants.MEMBERSHIP_CACHE_TIMEOUT
+
+
+def load_memberships(user_id):
+    version = membership_version(user_id)
+    key = f'memberships:{user_id}:{version}'
+    packed = cache.get(key)
+    if packed is None:
+        packed = {
+            kind: array('I', sorted(model.objects.filter(
+                user_id=user_id
+            ).order_by().values_list(field, flat=True))).tobytes()
+            for kind, (model, field) in SOURCES.items()
+        }
+        cache.set(key, packed, cache_timeout())
+
+    ids = {}
+    for kind, data in packed.items():
+        ids[kind] = array('I')
+        ids[kind].frombytes(data)
+    return Memberships(version, **ids)
+
+
+def memberships_for(request):
+    """Loads the user's memberships once per request."""
+    if not request.user.is_authenticated:
+        return Memberships()
+    if not hasattr(request, '_memberships'):
+        request._memberships = load_memberships(request.user.pk)
+    return request._memberships
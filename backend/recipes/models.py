@@ -1,9 +1,17 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVectorField,
+                                            TrigramSimilarity)
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import connections, models
+from django.db.models import F, Prefetch, Q, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 from django.urls import reverse
 
 from foodgram.constants import Constants
+from foodgram.storage import content_storage
 
 User = get_user_model()
 
@@ -19,6 +27,10 @@ class Tag(models.Model):
         verbose_name='Слаг',
         unique=True
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Изменён'
+    )
 
     class Meta:
         verbose_name = 'тег'
@@ -39,6 +51,10 @@ class Ingredient(models.Model):
         verbose_name='Единицы измерения',
         max_length=Constants.INGREDIENT_UNIT_MAX_LENGTH
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Изменён'
+    )
 
     class Meta:
         verbose_name = 'ингредиент'
@@ -49,6 +65,43 @@ class Ingredient(models.Model):
         return f'{self.name} ({self.measurement_unit})'
 
 
+class RecipeQuerySet(models.QuerySet):
+    def with_related(self):
+        return self.prefetch_related(
+            'author',
+            Prefetch(
+                'recipeingredient_set',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+            'tags',
+        )
+
+    def search(self, text):
+        if connections[self.db].vendor != 'postgresql':
+            return self.filter(name__icontains=text)
+        query = SearchQuery(
+            text, config=Constants.SEARCH_CONFIG, search_type='websearch'
+        )
+        return self.annotate(
+            search_rank=SearchRank(F('search_vector'), query),
+            name_similarity=TrigramSimilarity('name', text),
+        ).filter(
+            Q(search_vector=query) | Q(name__trigram_similar=text)
+        ).order_by('-search_rank', '-name_similarity', 'id')
+
+    def first_per_author(self, limit):
+        ranked = self.order_by().annotate(recipe_rank=Window(
+            expression=RowNumber(),
+            partition_by=[F('author_id')],
+            order_by=[F('name').asc(), F('id').asc()]
+        )).values('id', 'recipe_rank')
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(pk__in=RawSQL(
+            f'SELECT id FROM ({sql}) AS ranked WHERE recipe_rank <= %s',
+            (*params, limit)
+        ))
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User,
@@ -62,8 +115,15 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         upload_to='media/',
+        storage=content_storage,
         verbose_name='Картинка'
     )
+    image_variants = models.CharField(
+        max_length=100,
+        blank=True,
+        editable=False,
+        verbose_name='Картинка с готовыми вариантами'
+    )
     text = models.TextField(
         verbose_name='Описание'
     )
@@ -97,6 +157,28 @@ class Recipe(models.Model):
         related_name='favorites',
         blank=True
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном'
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В корзинах'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Изменён'
+    )
+    popularity = models.FloatField(
+        default=0,
+        editable=False,
+        verbose_name='Популярность'
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
 
     def get_absolute_url(self):
         return reverse('recipes-detail', kwargs={'pk': self.pk})
@@ -105,6 +187,18 @@ class Recipe(models.Model):
         verbose_name = 'рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['name', 'id'], name='recipe_name_id_idx'),
+            models.Index(
+                fields=['-popularity', 'id'], name='recipe_popularity_idx'
+            ),
+            GinIndex(fields=['search_vector'], name='recipe_search_idx'),
+            GinIndex(
+                fields=['name'],
+                name='recipe_name_trgm_idx',
+                opclasses=['gin_trgm_ops']
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -160,6 +254,7 @@ class ShoppingCart(models.Model):
     added_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
+        unique_together = ['user', 'recipe']
         verbose_name = 'корзина покупок'
         verbose_name_plural = 'Корзины покупок'
         ordering = ['added_at']
@@ -179,6 +274,7 @@ class Favorite(models.Model):
         verbose_name='Рецепт',
         on_delete=models.CASCADE
     )
+    added_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         unique_together = ['user', 'recipe']
@@ -188,3 +284,59 @@ class Favorite(models.Model):
 
     def __str__(self):
         return f'{self.recipe} в избранном у {self.user}'
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        verbose_name='Подписчик',
+        related_name='feed',
+        on_delete=models.CASCADE
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        related_name='feed_entries',
+        on_delete=models.CASCADE
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор',
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+
+    class Meta:
+        unique_together = ['user', 'recipe']
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        ordering = ['user', '-recipe']
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
+
+
+class SimilarRecipe(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        related_name='similar_recipes',
+        on_delete=models.CASCADE
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        verbose_name='Похожий рецепт',
+        related_name='similar_to',
+        on_delete=models.CASCADE
+    )
+    score = models.FloatField(verbose_name='Сходство')
+    built_at = models.DateTimeField(verbose_name='Рассчитано')
+
+    class Meta:
+        unique_together = ['recipe', 'similar']
+        verbose_name = 'похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        ordering = ['recipe', '-score']
+
+    def __str__(self):
+        return f'{self.similar} похож на {self.recipe}'
@@ -0,0 +1,171 @@
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import groupby
+
+from foodgram.constants import Constants
+
+from .models import Recipe, RecipeIngredient
+
+
+def contains(ids, value):
+    position = bisect_left(ids, value)
+    return position < len(ids) and ids[position] == value
+
+
+def insert(ids, value):
+    position = bisect_left(ids, value)
+    if position < len(ids) and ids[position] == value:
+        return False
+    ids.insert(position, value)
+    return True
+
+
+def remove(ids, value):
+    position = bisect_left(ids, value)
+    if position < len(ids) and ids[position] == value:
+        del ids[position]
+        return True
+    return False
+
+
+def build_postings(rows):
+    return {
+        key: array('I', sorted({value for _, value in group}))
+        for key, group in groupby(rows, key=lambda row: row[0])
+    }
+
+
+class PantryIndex:
+    """Inverted index: ingredient id -> sorted recipe ids.
+
+    Each worker process keeps its own copy; writes made by other
+    processes become visible after the TTL expires.
+    """
+
+    def __init__(self, ttl=Constants.PANTRY_INDEX_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # Кортеж (recipes, tags, sizes, deleted, built_at) заменяется
+        # целиком: читатели берут его без блокировки.
+        self._state = None
+        self._stale = True
+
+    def invalidate(self):
+        self._stale = True
+
+    def is_fresh(self, state):
+        return (
+            state is not None
+            and not self._stale
+            and time.monotonic() - state[4] <= self.ttl
+        )
+
+    def is_stale(self):
+        return not self.is_fresh(self._state)
+
+    def _load(self):
+        state = self._state
+        if self.is_fresh(state):
+            return state
+        with self._lock:
+            state = self._state
+            if self.is_fresh(state):
+                return state
+            self._stale = False
+            try:
+                recipes = build_postings(
+                    RecipeIngredient.objects.order_by(
+                        'ingredient_id', 'recipe_id'
+                    ).values_list('ingredient_id', 'recipe_id').iterator()
+                )
+                tags = build_postings(
+                    Recipe.tags.through.objects.order_by(
+                        'tag_id', 'recipe_id'
+                    ).values_list('tag_id', 'recipe_id').iterator()
+                )
+            except BaseException:
+                self._stale = True
+                raise
+            sizes = Counter()
+            for ids in recipes.values():
+                sizes.update(ids)
+            state = (recipes, tags, sizes, set(), time.monotonic())
+            self._state = state
+            return state
+
+    def add_ingredients(self, recipe_id, ingredient_ids):
+        state = self._state
+        if state is None:
+            return
+        recipes, _, sizes, deleted, _ = state
+        with self._lock:
+            deleted.discard(recipe_id)
+            for ingredient_id in ingredient_ids:
+                ids = recipes.setdefault(ingredient_id, array('I'))
+                if insert(ids, recipe_id):
+                    sizes[recipe_id] += 1
+
+    def remove_ingredients(self, recipe_id, ingredient_ids):
+        state = self._state
+        if state is None:
+            return
+        recipes, _, sizes, _, _ = state
+        with self._lock:
+            for ingredient_id in ingredient_ids:
+                ids = recipes.get(ingredient_id)
+                if ids is not None and remove(ids, recipe_id):
+                    sizes[recipe_id] -= 1
+
+    def set_tags(self, recipe_id, tag_ids, present):
+        state = self._state
+        if state is None:
+            return
+        tags = state[1]
+        with self._lock:
+            for tag_id in tag_ids:
+                ids = tags.setdefault(tag_id, array('I'))
+                if present:
+                    insert(ids, recipe_id)
+                else:
+                    remove(ids, recipe_id)
+
+    def remove_recipe(self, recipe_id):
+        state = self._state
+        if state is not None:
+            state[3].add(recipe_id)
+
+    def best_matches(self, ingredient_ids, tag_ids=None, limit=10):
+        """Recipes needing the fewest extra ingredients.
+
+        Returns (recipe_id, matched, missing) tuples.
+        """
+        recipes, tags, sizes, deleted, _ = self._load()
+        matched = Counter()
+        for ingredient_id in set(ingredient_ids):
+            matched.update(recipes.get(ingredient_id, ()))
+
+        candidates = matched.items()
+        if tag_ids is not None:
+            tag_lists = [tags.get(tag_id, ()) for tag_id in tag_ids]
+            candidates = (
+                (recipe_id, count) for recipe_id, count in candidates
+                if any(contains(ids, recipe_id) for ids in tag_lists)
+            )
+        return [
+            (recipe_id, count, sizes[recipe_id] - count)
+            for recipe_id, count in heapq.nsmallest(
+                limit,
+                (
+                    (recipe_id, count) for recipe_id, count in candidates
+                    if recipe_id not in deleted
+                ),
+                key=lambda item: (sizes[item[0]] - item[1], -item[1], item[0])
+            )
+        ]
+
+
+pantry_index = PantryIndex()
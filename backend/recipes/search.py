@@ -0,0 +1,35 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import connections
+from django.db.models import OuterRef, Subquery
+
+from foodgram.constants import Constants
+
+from .models import RecipeIngredient
+
+
+def recipe_search_vector():
+    ingredient_names = RecipeIngredient.objects.filter(
+        recipe=OuterRef('pk')
+    ).order_by().values('recipe').annotate(
+        names=StringAgg('ingredient__name', ' ')
+    ).values('names')
+    return (
+        SearchVector(
+            'name', weight='A', config=Constants.SEARCH_CONFIG
+        )
+        + SearchVector(
+            Subquery(ingredient_names),
+            weight='B',
+            config=Constants.SEARCH_CONFIG
+        )
+        + SearchVector(
+            'text', weight='C', config=Constants.SEARCH_CONFIG
+        )
+    )
+
+
+def update_search_vectors(queryset):
+    if connections[queryset.db].vendor != 'postgresql':
+        return 0
+    return queryset.update(search_vector=recipe_search_vector())
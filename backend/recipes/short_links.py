@@ -0,0 +1,83 @@
+import string
+import threading
+from collections import OrderedDict
+
+from foodgram.constants import Constants
+
+from .models import Recipe
+
+ALPHABET = string.digits + string.ascii_letters
+BASE = len(ALPHABET)
+# Первичный ключ помещается в bigint: 2 ** 63 - 1 занимает 11 символов.
+MAX_ID = 2 ** 63 - 1
+MAX_CODE_LENGTH = 11
+
+
+def encode(number):
+    if number == 0:
+        return ALPHABET[0]
+    code = []
+    while number:
+        number, remainder = divmod(number, BASE)
+        code.append(ALPHABET[remainder])
+    return ''.join(reversed(code))
+
+
+def decode(code):
+    if len(code) > MAX_CODE_LENGTH:
+        raise ValueError('Слишком длинный код.')
+    number = 0
+    for char in code:
+        position = ALPHABET.find(char)
+        if position < 0:
+            raise ValueError(f'Недопустимый символ в коде: {char!r}')
+        number = number * BASE + position
+    if number > MAX_ID:
+        raise ValueError('Слишком большой код.')
+    return number
+
+
+class LRUCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+resolved_links = LRUCache(Constants.SHORT_LINK_CACHE_SIZE)
+
+
+def resolve(code):
+    pk = resolved_links.get(code)
+    if pk is not None:
+        return pk
+    try:
+        pk = decode(code)
+    except ValueError:
+        return None
+    if not Recipe.objects.filter(pk=pk).exists():
+        return None
+    resolved_links.set(code, pk)
+    return pk
@@ -0,0 +1,171 @@
+from django.db import connections, transaction
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_migrate, pre_save)
+from django.dispatch import Signal, receiver
+
+from user.models import Subscription, User
+
+from .cache import bump_catalog_generation
+from .images import AVATAR_VARIANTS, RECIPE_VARIANTS, schedule_variants
+from .ingredient_index import ingredient_index
+from .memberships import invalidate_memberships
+from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                     ShoppingCart, Tag)
+from .pantry_index import pantry_index
+from .search import update_search_vectors
+from .short_links import encode, resolved_links
+
+# Поля автора, которые выводятся в ответах с рецептами.
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name', 'avatar')
+
+# Отправляется RecipeSerializer.handle_ingredients с аргументами
+# recipe_id, added и removed (id ингредиентов).
+ingredients_changed = Signal()
+
+
+def change_counter(model, pk, field, delta):
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def connect_counter(sender, target_model, target_field, counter):
+    def on_save(instance, created, **kwargs):
+        if created:
+            change_counter(
+                target_model, getattr(instance, target_field), counter, 1
+            )
+
+    def on_delete(instance, **kwargs):
+        change_counter(
+            target_model, getattr(instance, target_field), counter, -1
+        )
+
+    post_save.connect(on_save, sender=sender, weak=False)
+    post_delete.connect(on_delete, sender=sender, weak=False)
+
+
+connect_counter(Recipe, User, 'author_id', 'recipes_count')
+connect_counter(Subscription, User, 'author_id', 'followers_count')
+connect_counter(Favorite, Recipe, 'recipe_id', 'favorites_count')
+connect_counter(ShoppingCart, Recipe, 'recipe_id', 'in_carts_count')
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver(pre_migrate)
+def create_search_extensions(sender, using, **kwargs):
+    connection = connections[using]
+    if sender.name == 'recipes' and connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_recipe_search_vector(sender, instance, **kwargs):
+    # Ингредиенты пишутся после рецепта, поэтому вектор считается
+    # при фиксации транзакции.
+    transaction.on_commit(lambda: update_search_vectors(
+        Recipe.objects.filter(pk=instance.pk)
+    ))
+
+
+@receiver(post_save, sender=Ingredient)
+def refresh_ingredient_search_vectors(sender, instance, created, **kwargs):
+    if not created:
+        transaction.on_commit(lambda: update_search_vectors(
+            Recipe.objects.filter(ingredients=instance)
+        ))
+
+
+@receiver(ingredients_changed)
+def update_pantry_index(sender, recipe_id, added, removed, **kwargs):
+    def apply():
+        pantry_index.remove_ingredients(recipe_id, removed)
+        pantry_index.add_ingredients(recipe_id, added)
+
+    transaction.on_commit(apply)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def update_pantry_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse or pk_set is None:
+        transaction.on_commit(pantry_index.invalidate)
+        return
+    transaction.on_commit(lambda: pantry_index.set_tags(
+        instance.pk, pk_set, action == 'post_add'
+    ))
+
+
+@receiver(post_delete, sender=Recipe)
+def forget_pantry_recipe(sender, instance, **kwargs):
+    pantry_index.remove_recipe(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Favorite)
+@receiver([post_save, post_delete], sender=ShoppingCart)
+@receiver([post_save, post_delete], sender=Subscription)
+def invalidate_user_memberships(sender, instance, **kwargs):
+    invalidate_memberships(instance.user_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def forget_short_link(sender, instance, **kwargs):
+    resolved_links.discard(encode(instance.pk))
+
+
+@receiver(post_save, sender=Recipe)
+def schedule_recipe_image_variants(sender, instance, **kwargs):
+    schedule_variants(instance.image, RECIPE_VARIANTS)
+
+
+@receiver(post_save, sender=User)
+def schedule_avatar_variants(sender, instance, **kwargs):
+    schedule_variants(instance.avatar, AVATAR_VARIANTS)
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+@receiver([post_save, post_delete], sender=Tag)
+@receiver([post_save, post_delete], sender=Ingredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_responses(sender, **kwargs):
+    # До фиксации другие запросы ещё читают старые строки и сохранили бы
+    # их в кэш под новым поколением.
+    transaction.on_commit(bump_catalog_generation)
+
+
+@receiver(pre_save, sender=User)
+def detect_author_changes(sender, instance, update_fields=None, **kwargs):
+    # Регистрации, смена пароля и входы не трогают кэш рецептов.
+    instance.author_fields_changed = False
+    if instance.pk is None or not instance.recipes_count:
+        return
+    fields = [
+        name for name in AUTHOR_FIELDS
+        if update_fields is None or name in update_fields
+    ]
+    if not fields:
+        return
+    stored = User.objects.filter(pk=instance.pk).values(*fields).first()
+    instance.author_fields_changed = stored is None or any(
+        (stored[name] or '') != (
+            User._meta.get_field(name).get_prep_value(
+                getattr(instance, name)
+            ) or ''
+        )
+        for name in fields
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_responses(sender, instance, **kwargs):
+    if getattr(instance, 'author_fields_changed', False):
+        transaction.on_commit(bump_catalog_generation)
@@ -0,0 +1,110 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from foodgram.constants import Constants
+
+from .models import Recipe, RecipeIngredient, SimilarRecipe
+
+
+def jaccard(first, second):
+    common = len(first & second)
+    return common / (len(first) + len(second) - common)
+
+
+def cosine(first, second):
+    return len(first & second) / math.sqrt(len(first) * len(second))
+
+
+METRICS = {'jaccard': jaccard, 'cosine': cosine}
+
+
+class RecipeSimilarity:
+    """Top-K neighbours over ingredient and tag sets.
+
+    Recipes are binary feature sets: ingredient ids as is, tag ids
+    negated. Candidates come from an inverted index; features shared by
+    more than max_posting recipes (salt, a common tag) count towards the
+    score but do not produce candidates on their own.
+    """
+
+    def __init__(
+        self,
+        metric='jaccard',
+        top_k=Constants.SIMILAR_RECIPES_TOP_K,
+        max_posting=Constants.SIMILAR_MAX_POSTING
+    ):
+        self.score = METRICS[metric]
+        self.top_k = top_k
+        self.max_posting = max_posting
+        self.features = defaultdict(set)
+        self.postings = defaultdict(list)
+
+    def load(self):
+        rows = RecipeIngredient.objects.values_list(
+            'recipe_id', 'ingredient_id'
+        ).iterator()
+        for recipe_id, ingredient_id in rows:
+            self.features[recipe_id].add(ingredient_id)
+        rows = Recipe.tags.through.objects.values_list(
+            'recipe_id', 'tag_id'
+        ).iterator()
+        for recipe_id, tag_id in rows:
+            self.features[recipe_id].add(-tag_id)
+        for recipe_id, features in self.features.items():
+            for feature in features:
+                self.postings[feature].append(recipe_id)
+        return self
+
+    def candidates(self, recipe_id):
+        overlap = Counter()
+        for feature in self.features.get(recipe_id, ()):
+            recipe_ids = self.postings[feature]
+            if len(recipe_ids) <= self.max_posting:
+                overlap.update(recipe_ids)
+        overlap.pop(recipe_id, None)
+        return overlap.keys()
+
+    def neighbours(self, recipe_id):
+        features = self.features.get(recipe_id)
+        if not features:
+            return []
+        return heapq.nlargest(self.top_k, (
+            (self.score(features, self.features[other]), other)
+            for other in self.candidates(recipe_id)
+        ))
+
+    def affected(self, recipe_ids):
+        """Recipes whose neighbour lists may change with recipe_ids."""
+        affected = set(recipe_ids)
+        for recipe_id in recipe_ids:
+            affected.update(self.candidates(recipe_id))
+        affected.update(SimilarRecipe.objects.filter(
+            similar_id__in=recipe_ids
+        ).values_list('recipe_id', flat=True))
+        return affected
+
+    def save(self, recipe_ids, batch_size=Constants.SIMILAR_BATCH_SIZE):
+        recipe_ids = sorted(recipe_ids)
+        built_at = timezone.now()
+        saved = 0
+        for start in range(0, len(recipe_ids), batch_size):
+            batch = recipe_ids[start:start + batch_size]
+            rows = [
+                SimilarRecipe(
+                    recipe_id=recipe_id,
+                    similar_id=other,
+                    score=score,
+                    built_at=built_at
+                )
+                for recipe_id in batch
+                for score, other in self.neighbours(recipe_id)
+            ]
+            with transaction.atomic():
+                SimilarRecipe.objects.filter(recipe_id__in=batch).delete()
+                SimilarRecipe.objects.bulk_create(rows)
+            saved += len(rows)
+        return saved
@@ -0,0 +1,106 @@
+import base64
+import tempfile
+import textwrap
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase
+from PIL import Image
+
+from .images import (InvalidImage, decode_base64_image, flatten,
+                     variant_name, variant_url)
+from .ingredient_index import IngredientIndex
+from .models import Ingredient, Recipe
+
+
+def encode_png(size=(400, 400)):
+    buffer = BytesIO()
+    Image.effect_noise(size, 64).convert('RGB').save(buffer, 'PNG')
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+class DecodeBase64ImageTest(SimpleTestCase):
+
+    def test_line_wrapped_input(self):
+        encoded = encode_png()
+        self.assertGreater(len(encoded), 2 * 64 * 1024)
+        wrapped = '\r\n'.join(textwrap.wrap(encoded, 76))
+
+        image = decode_base64_image(
+            f'data:image/png;base64,{wrapped}', name='wrapped'
+        )
+
+        self.assertEqual(image.name, 'wrapped.png')
+        self.assertEqual(image.read(), base64.b64decode(encoded))
+
+    def test_truncated_input(self):
+        with self.assertRaises(InvalidImage):
+            decode_base64_image(
+                f'data:image/png;base64,{encode_png()[:-1]}', name='broken'
+            )
+
+
+class IngredientIndexTest(TestCase):
+
+    def test_invalidate_keeps_snapshot_for_readers(self):
+        Ingredient.objects.create(name='Соль', measurement_unit='г')
+        index = IngredientIndex()
+        snapshot = index._load()
+        index.invalidate()
+
+        self.assertTrue(index.is_stale())
+        self.assertIs(index._snapshot, snapshot)
+        Ingredient.objects.create(name='Сахар', measurement_unit='г')
+        self.assertEqual(
+            [item['name'] for item in index.search('с')], ['Сахар', 'Соль']
+        )
+
+
+class LoadIngredientsTest(TestCase):
+
+    def load(self, content):
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.json', encoding='utf-8'
+        ) as file:
+            file.write(content)
+            file.flush()
+            call_command('load_ingredients', file.name, stdout=StringIO())
+
+    def test_truncated_json_is_rejected(self):
+        with self.assertRaises(CommandError):
+            self.load(
+                '[{"name": "Соль", "measurement_unit": "г"}, {"name": "Са'
+            )
+        self.assertFalse(Ingredient.objects.exists())
+
+    def test_complete_json_is_loaded(self):
+        self.load('[{"name": "Соль", "measurement_unit": "г"}]')
+        self.assertEqual(
+            list(Ingredient.objects.values_list('name', 'measurement_unit')),
+            [('Соль', 'г')]
+        )
+
+
+class ImageVariantsTest(SimpleTestCase):
+
+    def test_variant_url_does_not_touch_storage(self):
+        name = 'media/ab/ab.png'
+        ready = Recipe(image=name, image_variants=name)
+        pending = Recipe(image=name)
+        with mock.patch.object(default_storage, 'exists') as exists:
+            self.assertEqual(
+                variant_url(ready.image, 'thumbnail'),
+                default_storage.url(variant_name(name, 'thumbnail'))
+            )
+            self.assertEqual(
+                variant_url(pending.image, 'thumbnail'), pending.image.url
+            )
+        exists.assert_not_called()
+
+    def test_transparency_becomes_white(self):
+        image = Image.new('RGBA', (4, 4), (255, 0, 0, 0))
+        self.assertEqual(flatten(image).getpixel((0, 0)), (255, 255, 255))
+        opaque = Image.new('RGBA', (4, 4), (255, 0, 0, 255))
+        self.assertEqual(flatten(opaque).getpixel((0, 0)), (255, 0, 0))
@@ -0,0 +1,81 @@
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .memberships import invalidate_memberships
+from .models import Recipe
+
+INSERT_SQL = '''
+INSERT INTO {table} (user_id, recipe_id, added_at)
+SELECT %s, id, %s FROM {recipe} WHERE id = ANY(%s)
+ON CONFLICT (user_id, recipe_id) DO NOTHING
+RETURNING recipe_id
+'''
+DELETE_SQL = '''
+DELETE FROM {table} WHERE user_id = %s AND recipe_id = ANY(%s)
+RETURNING recipe_id
+'''
+
+
+def change_counters(recipe_ids, field, delta):
+    # bulk-операции не отправляют сигналы, счётчики меняются здесь.
+    if not recipe_ids:
+        return
+    queryset = Recipe.objects.filter(pk__in=recipe_ids)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def execute_returning(sql, model, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(
+            table=model._meta.db_table, recipe=Recipe._meta.db_table
+        ), params)
+        return {row[0] for row in cursor.fetchall()}
+
+
+@transaction.atomic
+def add_recipes(model, counter, user, recipe_ids):
+    """Adds recipes to a user list; returns the ids actually inserted."""
+    recipe_ids = sorted(set(recipe_ids))
+    if not recipe_ids:
+        return set()
+    if connection.vendor == 'postgresql':
+        added = execute_returning(
+            INSERT_SQL, model, [user.pk, timezone.now(), recipe_ids]
+        )
+    else:
+        present = set(model.objects.filter(
+            user=user, recipe_id__in=recipe_ids
+        ).values_list('recipe_id', flat=True))
+        added = set(Recipe.objects.filter(
+            pk__in=recipe_ids
+        ).values_list('pk', flat=True)) - present
+        model.objects.bulk_create(
+            [model(user=user, recipe_id=recipe_id) for recipe_id in added],
+            ignore_conflicts=True
+        )
+    change_counters(added, counter, 1)
+    if added:
+        invalidate_memberships(user.pk)
+    return added
+
+
+@transaction.atomic
+def remove_recipes(model, counter, user, recipe_ids):
+    """Removes recipes from a user list; returns the ids actually deleted."""
+    recipe_ids = sorted(set(recipe_ids))
+    if not recipe_ids:
+        return set()
+    if connection.vendor != 'postgresql':
+        queryset = model.objects.filter(user=user, recipe_id__in=recipe_ids)
+        removed = set(queryset.values_list('recipe_id', flat=True))
+        # Счётчики обновят сигналы post_delete.
+        queryset.delete()
+        return removed
+    removed = execute_returning(DELETE_SQL, model, [user.pk, recipe_ids])
+    change_counters(removed, counter, -1)
+    if removed:
+        invalidate_memberships(user.pk)
+    return removed
@@ -6,7 +6,15 @@ from .models import User
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
-    list_display = ('email', 'username', 'first_name', 'last_name', 'is_staff')
+    list_display = (
+        'email',
+        'username',
+        'first_name',
+        'last_name',
+        'is_staff',
+        'recipes_count',
+        'followers_count',
+    )
 
     fieldsets = BaseUserAdmin.fieldsets + (
         (None, {'fields': ('avatar',)}),
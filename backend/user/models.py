@@ -2,6 +2,8 @@ from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from foodgram.storage import content_storage
+
 
 class User(AbstractUser):
     email = models.EmailField(unique=True, verbose_name='Почта')
@@ -17,8 +19,25 @@ class User(AbstractUser):
     avatar = models.ImageField(
         blank=True,
         null=True,
+        storage=content_storage,
         verbose_name='Аватар'
     )
+    avatar_variants = models.CharField(
+        max_length=100,
+        blank=True,
+        editable=False,
+        verbose_name='Аватар с готовыми вариантами'
+    )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество рецептов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписчиков'
+    )
 
     class Meta:
         verbose_name = 'пользователь'